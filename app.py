@@ -11,14 +11,25 @@ import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timedelta, timezone
 import uuid
-
-# 視覺化套件
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import os
+from local_store import LOCAL_DB, SheetMirror
+from storage import make_backend
+from render import render_header, render_daily_stats_html, render_supp_med_html, render_meal_stats_simple, render_rolling_html
+from metrics import Metrics
+from trend import RES_LABEL, build_trend
+from export import ExportView, iter_daily_csv, iter_log_csv
 
 # --- 1. 設定頁面 ---
 st.set_page_config(page_title="大文的飲食日記", page_icon="🐱", layout="wide")
 
+# 效能量測：每次 rerun 一筆紀錄，Sheets 呼叫一併計數 (見 metrics.py)
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+metrics = get_metrics()
+metrics.start_run()
+
 # --- 小工具 ---
 def safe_float(value):
     try:
@@ -39,32 +50,6 @@ def format_time_str(t_str):
         return f"{t_str[:2]}:{t_str[2:]}"
     return t_str if ":" in str(t_str) else get_tw_time().strftime("%H:%M")
 
-def clean_duplicate_finish_records(df):
-    if df.empty: return df
-    mask_finish = df['ItemID'].isin(['WASTE', 'FINISH'])
-    df_others = df[~mask_finish]
-    df_finish = df[mask_finish]
-    if df_finish.empty: return df
-    df_finish_clean = df_finish.drop_duplicates(subset=['Meal_Name'], keep='last')
-    return pd.concat([df_others, df_finish_clean], ignore_index=True)
-
-def calculate_intake_breakdown(df):
-    if df.empty: return 0.0, 0.0
-    if 'Category' in df.columns: df['Category'] = df['Category'].astype(str).str.strip()
-    exclude_list = ['藥品', '保養品']
-    df_calc = df[~df['Category'].isin(exclude_list)].copy()
-    if df_calc.empty: return 0.0, 0.0
-    df_input = df_calc[df_calc['Net_Quantity'] > 0]
-    df_waste = df_calc[df_calc['Net_Quantity'] < 0]
-    water_cats = ['水', '飲用水']
-    input_water = df_input[df_input['Category'].isin(water_cats)]['Net_Quantity'].sum()
-    input_food = df_input[~df_input['Category'].isin(water_cats)]['Net_Quantity'].sum()
-    total_input = input_water + input_food
-    total_waste = df_waste['Net_Quantity'].sum()
-    ratio_water = input_water / total_input if total_input > 0 else 0.0
-    ratio_food = input_food / total_input if total_input > 0 else 1.0
-    return input_food + (total_waste * ratio_food), input_water + (total_waste * ratio_water)
-
 # --- CSS 注入 ---
 def inject_custom_css():
     st.markdown("""
@@ -100,34 +85,8 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-def render_header(date_str):
-    cat_svg = '<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M12 5c.67 0 1.35.09 2 .26 1.78-2 5.03-2.84 6.42-2.26 1.4.58-.42 7-.42 7 .57 1.07 1 2.24 1 3.44C21 17.9 16.97 21 12 21S3 17.9 3 13.44C3 12.24 3.43 11.07 4 10c0 0-1.82-6.42-.42-7 1.39-.58 4.64.26 6.42 2.26.65-.17 1.33-.26 2-.26z"/></svg>'
-    return f'<div class="main-header"><div class="header-icon">{cat_svg}</div><div><div style="font-size:24px; font-weight:800; color:#012172;">大文的飲食日記</div><div style="font-size:15px; font-weight:500; color:#5A6B8C;">{date_str}</div></div></div>'
-
-def render_daily_stats_html(day_stats):
-    def get_stat_html(label, value, unit, color_class):
-        return f'<div class="stat-item"><div class="stat-header {color_class}">{label}</div><div style="display:flex; align-items:baseline;"><span class="stat-value">{value}</span><span class="stat-unit">{unit}</span></div></div>'
-    html = '<div class="grid-row-3">' + get_stat_html("熱量", int(day_stats['cal']), "kcal", "bg-orange") + get_stat_html("食物", f"{day_stats['food']:.1f}", "g", "bg-blue") + get_stat_html("飲水", f"{day_stats['water']:.1f}", "ml", "bg-cyan") + '</div>'
-    html += '<div class="grid-row-2">' + get_stat_html("蛋白質", f"{day_stats['prot']:.1f}", "g", "bg-red") + get_stat_html("脂肪", f"{day_stats['fat']:.1f}", "g", "bg-yellow") + '</div>'
-    return html
-
-def render_supp_med_html(supp_list, med_list):
-    def get_tag_html(items, type_class):
-        if not items: return '<span style="color:#5A6B8C; font-size:13px;">無</span>'
-        return "".join([f'<span class="tag {type_class}">{item["name"]}<span class="tag-count">x{int(item["count"])}</span></span>' for item in items])
-    html = '<div style="display:grid; grid-template-columns: 1fr 1fr; gap:20px; margin-top:10px;">'
-    html += f'<div><div style="font-size:12px;font-weight:700;color:#047857;margin-bottom:4px;">保養品</div><div class="tag-container">{get_tag_html(supp_list, "tag-green")}</div></div>'
-    html += f'<div style="border-left:1px solid #f1f5f9;padding-left:20px;"><div><div style="font-size:12px;font-weight:700;color:#be123c;margin-bottom:4px;">藥品</div><div class="tag-container">{get_tag_html(med_list, "tag-red")}</div></div></div></div>'
-    return html
-
-def render_meal_stats_simple(meal_stats):
-    html = '<div class="simple-grid">'
-    for l, v, u in [("熱量", int(meal_stats['cal']), "kcal"), ("食物", f"{meal_stats['food']:.1f}", "g"), ("飲水", f"{meal_stats['water']:.1f}", "ml"), ("蛋白", f"{meal_stats['prot']:.1f}", "g"), ("脂肪", f"{meal_stats['fat']:.1f}", "g")]:
-        html += f'<div class="simple-item"><div style="font-size:11px; color:#5A6B8C;">{l}</div><div style="font-size:16px; font-weight:800;">{v}<span style="font-size:10px;">{u}</span></div></div>'
-    return html + '</div>'
-
 # --- 連線與資料讀取 ---
-@st.cache_resource
+# 連線在 SheetMirror 的背景執行緒進行；有本機快照時先用快照畫面 (見 local_store.py)
 def init_connection():
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     creds_dict = st.secrets["gcp_service_account"]
@@ -135,28 +94,76 @@ def init_connection():
     client = gspread.authorize(creds)
     return client
 
-try:
-    client = init_connection()
-    spreadsheet = client.open("DaWen daily record")
-    sheet_log = spreadsheet.worksheet("Log_Data")
-    sheet_db = spreadsheet.worksheet("DB_Items")
-except Exception as e:
-    st.error(f"連線失敗：{e}"); st.stop()
+def get_backend_name():
+    # 儲存後端：sheets (預設) / sqlite / fake，見 storage.py
+    if os.environ.get("DAWEN_BACKEND"): return os.environ["DAWEN_BACKEND"]
+    try: return st.secrets.get("storage_backend", "sheets")
+    except Exception: return "sheets"
 
-@st.cache_data(ttl=5)
+def get_default_weight():
+    # 體重 (kg) 預設值，可在 secrets 設 body_weight_kg；0 表示未設定
+    try: return float(st.secrets.get("body_weight_kg", 0.0))
+    except Exception: return 0.0
+
+def open_backend():
+    # 後端物件本身不連線，open() / worksheet() 才連線 (在 SheetMirror 的背景執行緒)；呼叫都經過量測
+    backend = make_backend(get_backend_name(), init_connection)
+    def open_shard(title, header=None):
+        ws = backend.worksheet(title, header)
+        return metrics.instrument(ws) if ws is not None else None
+    return (lambda: tuple(metrics.instrument(ws) for ws in backend.open())), open_shard
+
+@st.cache_resource
+def get_mirror():
+    name = get_backend_name()
+    open_worksheets, open_shard = open_backend()
+    # 已結束的年度自動封存到 Log_Data_<年>，平常只讀 Log_Data (見 shards.py)
+    return SheetMirror(open_worksheets, LOCAL_DB if name == "sheets" else LOCAL_DB.replace(".sqlite", f"_{name}.sqlite"), open_shard=open_shard)
+
+mirror = get_mirror()
+if not mirror.has_snapshot(): mirror.ready.wait()  # 第一次使用沒有快照，只能等連線
+if mirror.error and not mirror.has_snapshot() and not mirror.refresh():
+    st.error(f"連線失敗：{mirror.error}"); st.stop()
+
+# 觸發與 Sheets 同步：各 session 同時要求時只抓一次，TTL 依寫入/閒置調整 (見 coordinator.py)
+# 資料本身由 mirror 持有，整個 process 共用；失敗則沿用快照
 def load_data():
-    return pd.DataFrame(sheet_db.get_all_records()), pd.DataFrame(sheet_log.get_all_records())
-
-df_items, df_log = load_data()
-if not df_items.empty:
-    df_items.columns = [c.strip() for c in df_items.columns]
-    item_map = dict(zip(df_items['Item_Name'], df_items['ItemID']))
-    cal_map = dict(zip(df_items['Item_Name'], df_items['Ref_Cal_100g']))
-    prot_map = dict(zip(df_items['Item_Name'], df_items['Protein_Pct']))
-    fat_map = dict(zip(df_items['Item_Name'], df_items['Fat_Pct']))
-    phos_map = dict(zip(df_items['Item_Name'], df_items['Phos_Pct']))
-    cat_map = dict(zip(df_items['Item_Name'], df_items['Category']))
-    unit_map = dict(zip(df_items['Item_Name'], df_items['Unit_Type']))
+    mirror.sync()
+    return mirror.log.version
+
+with metrics.span("load_data") as sp:
+    load_data()
+    catalog = mirror.catalog  # DB_Items 編譯後的目錄，內容變了才重建 (見 catalog.py)
+    log_idx = mirror.index()  # log 依日期分區，取當日/單餐/區間都是切片 (見 log_index.py)
+    sp['rows'] = len(log_idx.df)
+st.session_state.seen_version = (mirror.log.version, mirror.summary.version)
+
+# 趨勢圖只在區間或彙總表變動時重畫；長區間自動改週/月分桶 (見 trend.py)
+@st.cache_data(max_entries=16, show_spinner=False)
+def trend_figure(d0, d1, version):
+    return build_trend(mirror.summary.range(d0, d1), d0, d1)
+
+# 匯出給獸醫：按下載時才在另一個執行緒逐段產生 CSV，不擋住頁面 (見 export.py)。
+# 未載入的封存分片由 ExportView 逐張讀取，不常駐；download_button 要完整的 bytes，最後一次組起來
+def export_csv(gen, d0, d1):
+    return b"".join(gen(ExportView(mirror.index(), mirror.shards, d0, d1), d0, d1))
+
+# --- 由共用快照衍生的當日資料 (同版本各 session 共用，見 LogIndex.derive) ---
+def day_tags(snap, d):
+    # 當日保養品與藥品：[{'name', 'count'}]
+    df = snap.day(d)
+    out = []
+    for cat in ['保養品', '藥品']:
+        sub = df[df['Category'] == cat]
+        out.append([{'name': k, 'count': v} for k, v in sub.groupby('Item_Name', observed=True)['Net_Quantity'].sum().items()] if not sub.empty else [])
+    return tuple(out)
+
+def meal_status(snap, d):
+    # 餐別選單的標註：已記 / 完食時間
+    df = snap.day(d)
+    m_stat = {m: " (已記)" for m in df['Meal_Name'].unique()}
+    for m, t in zip(df.loc[df['Is_Finish'], 'Meal_Name'], df.loc[df['Is_Finish'], 'Time']): m_stat[m] = f" (已記) (完食: {str(t)[:5]})"
+    return m_stat
 
 # --- 核心邏輯函數 ---
 def add_to_cart_callback(bowl_w, last_ref_w, last_ref_n):   
@@ -164,19 +171,20 @@ def add_to_cart_callback(bowl_w, last_ref_w, last_ref_n):
     sc_reading = safe_float(st.session_state.get('scale_val'))
     is_zeroed = st.session_state.get('check_zero', False)
     if category == "請選擇..." or sc_reading <= 0: return
-    unit = unit_map.get(item_name, "g")
+    it = catalog.get(item_name)
+    if it is None: return
+    unit = it.unit
     
     if unit in ["g", "ml"]:
         if is_zeroed: net_q, db_sc = sc_reading, last_ref_w + sc_reading
         else: net_q, db_sc = sc_reading - last_ref_w, sc_reading
     else: net_q, db_sc = sc_reading, last_ref_w
 
-    cal_v, prot_v, fat_v, phos_v = safe_float(cal_map.get(item_name)), safe_float(prot_map.get(item_name)), safe_float(fat_map.get(item_name)), safe_float(phos_map.get(item_name))
-    mult = 1 if unit not in ["g", "ml"] else (net_q / 100)
+    cal_v, prot_v, fat_v, phos_v = catalog.nutrients([item_name], [net_q])[0]
     st.session_state.cart.append({
-        "Category": cat_map.get(item_name), "ItemID": item_map.get(item_name), "Item_Name": item_name,
+        "Category": it.category, "ItemID": it.item_id, "Item_Name": item_name,
         "Scale_Reading": db_sc, "Bowl_Weight": bowl_w, "Net_Quantity": net_q,
-        "Cal_Sub": cal_v*mult, "Prot_Sub": prot_v*mult, "Fat_Sub": fat_v*mult, "Phos_Sub": phos_v*mult, "Unit": unit
+        "Cal_Sub": cal_v, "Prot_Sub": prot_v, "Fat_Sub": fat_v, "Phos_Sub": phos_v, "Unit": unit
     })
     st.session_state.scale_val, st.session_state.check_zero = None, False
     st.session_state.just_added = True
@@ -186,12 +194,10 @@ def save_finish_callback(f_type, w_net, w_cal, bowl_w, meal_n, f_time, f_date, r
     s_db_d, s_f_d = rec_date.strftime("%Y/%m/%d"), f_date.strftime("%Y/%m/%d")
     row = [str(uuid.uuid4()), f"{s_f_d} {f_time}:00", s_db_d, f"{f_time}:00", meal_n, "WASTE" if "剩" in f_type else "FINISH", "剩食" if "剩" in f_type else "完食", 0, bowl_w, -w_net if "剩" in f_type else 0, -w_cal if "剩" in f_type else 0, 0, 0, 0, "", "完食紀錄", f_time]
     try:
-        curr = sheet_log.get_all_values()
-        h = curr[0]
-        d_i, m_i, it_i, n_i = h.index('Date'), h.index('Meal_Name'), h.index('ItemID'), h.index('Item_Name')
-        for i in sorted([idx for idx, r in enumerate(curr[1:], 1) if r[d_i]==s_db_d and r[m_i]==meal_n and r[it_i] in ['WASTE', 'FINISH'] and r[n_i]=="完食紀錄"], reverse=True): sheet_log.delete_rows(i+1)
-        sheet_log.append_row(row)
-        st.toast("✅ 完食紀錄已更新"); load_data.clear(); st.session_state.just_saved = True; st.rerun()
+        # 以 (日期, 餐別) upsert：有舊紀錄原地覆寫，沒有才附加 (見 LogSync.upsert_finish)；已封存期間會被拒絕
+        with metrics.span("save_finish", rows=1):
+            mirror.upsert_finish(row)
+        st.toast("✅ 完食紀錄已更新"); mirror.fetcher.invalidate(); st.session_state.just_saved = True; st.rerun()
     except Exception as e: st.error(f"寫入失敗：{e}")
 
 # --- UI 佈局 ---
@@ -210,22 +216,37 @@ with st.sidebar:
     tw_now = get_tw_time()
     rec_date = st.date_input("📅 日期", tw_now)
     rec_time_str = format_time_str(st.text_input("🕒 時間", value=tw_now.strftime("%H%M")))
-    if st.button("🔄 重新整理"): load_data.clear(); st.rerun()
+    body_w = st.number_input("⚖️ 體重 (kg)", min_value=0.0, step=0.1, value=get_default_weight(), key="body_weight")
+    if st.button("🔄 重新整理"): mirror.log.invalidate(); mirror.fetcher.invalidate(wrote=False); st.rerun()  # 整張重抓：在表單上手動改過的格子也會讀到
+    if mirror.error: st.caption(f"⚠️ 離線：顯示本機快照 ({mirror.error})")
+    elif not mirror.ready.is_set(): st.caption("⏳ 與 Google Sheet 同步中，目前顯示本機快照")
+    if mirror.archive_status: st.caption(f"🗄️ {mirror.archive_status}")
+    j_st = mirror.journal.status()
+    if j_st['pending']: st.caption(f"📤 待上傳 {j_st['pending']} 筆" + (f"（重試中：{j_st['last_error']}）" if j_st['last_error'] else ""))
+    elif j_st['last_flush'] and not j_st['dead']: st.caption(f"✅ 已全部上傳 ({datetime.fromtimestamp(j_st['last_flush'], timezone(timedelta(hours=8))).strftime('%H:%M:%S')})")
+    if j_st['dead']:
+        # 一直寫不進去的列已移到待處理區，不再擋住其他列 (見 journal.py)
+        st.caption(f"⚠️ {j_st['dead']} 筆一直無法上傳，已暫停重試：{j_st['dead_error']}")
+        if st.button("📤 重新上傳", key="requeue_dead"): mirror.journal.requeue_dead(); st.rerun()
+    show_debug = st.toggle("🛠️ 效能除錯", key="debug_metrics")
+    debug_box = st.container()  # 本次 rerun 結束後才填入
+
+# 其他裝置存檔 (或背景上傳完成) 後自動重畫；同步本身走共用的協調器，不會多打 API
+@st.fragment(run_every=15)
+def watch_updates():
+    mirror.sync()
+    if st.session_state.get('seen_version') != (mirror.log.version, mirror.summary.version): st.rerun(scope="app")
+
+watch_updates()
 
 # --- Dashboard 數據處理 ---
-df_today = df_log[df_log['Date'] == rec_date.strftime("%Y/%m/%d")].copy() if not df_log.empty else pd.DataFrame()
-day_stats = {'cal':0, 'food':0, 'water':0, 'prot':0, 'fat':0}
-supp_l, med_l = [], []
-if not df_today.empty:
-    for c in ['Cal_Sub', 'Net_Quantity', 'Prot_Sub', 'Fat_Sub']: df_today[c] = pd.to_numeric(df_today[c], errors='coerce').fillna(0)
-    df_t_c = clean_duplicate_finish_records(df_today)
-    f, w = calculate_intake_breakdown(df_t_c)
-    day_stats.update({'cal': df_t_c['Cal_Sub'].sum(), 'food': f, 'water': w, 'prot': df_t_c['Prot_Sub'].sum(), 'fat': df_t_c['Fat_Sub'].sum()})
-    # 保養品與藥品
-    df_supp = df_today[df_today['Category'] == '保養品']
-    if not df_supp.empty: supp_l = [{'name': k, 'count': v} for k, v in df_supp.groupby('Item_Name')['Net_Quantity'].sum().items()]
-    df_med = df_today[df_today['Category'] == '藥品']
-    if not df_med.empty: med_l = [{'name': k, 'count': v} for k, v in df_med.groupby('Item_Name')['Net_Quantity'].sum().items()]
+with metrics.span("dashboard") as sp:
+    if mirror.ensure_history(rec_date, rec_date): log_idx = mirror.index()  # 查的是已封存的日期
+    df_today = log_idx.day(rec_date)
+    day_stats = {'cal':0, 'food':0, 'water':0, 'prot':0, 'fat':0}
+    supp_l, med_l = log_idx.derive(('tags', rec_date), lambda snap: day_tags(snap, rec_date))
+    if not df_today.empty: day_stats.update(mirror.summary.day(rec_date))
+    sp['rows'] = len(df_today)
 
 st.markdown(render_header(rec_date.strftime("%Y年 %m月 %d日")), unsafe_allow_html=True)
 col_dash, col_input = st.columns([4, 3], gap="medium")
@@ -240,43 +261,48 @@ with col_dash:
             d_s = (tw_now.date() - timedelta(days=6 if "7" in r_opt else 29))
             d_range = st.date_input("選擇日期區間", value=(d_s, tw_now.date()))
             if isinstance(d_range, tuple) and len(d_range)==2:
-                df_v = df_log.copy()
-                temp_d = pd.to_datetime(df_v['Date'], errors='coerce')
-                df_v = df_v[temp_d.notna()].copy(); df_v['D'] = temp_d[temp_d.notna()].dt.date
-                df_tr = df_v[(df_v['D'] >= d_range[0]) & (df_v['D'] <= d_range[1])]
-                if not df_tr.empty:
-                    tr_d = []
-                    for d, g in df_tr.groupby('D'):
-                        f_n, w_n = calculate_intake_breakdown(clean_duplicate_finish_records(g))
-                        tr_d.append({'Date': d, 'Cal': g['Cal_Sub'].sum(), 'Food': f_n, 'Water': w_n})
-                    df_ch = pd.DataFrame(tr_d).sort_values('Date')
-                    fig = make_subplots(specs=[[{"secondary_y": True}]])
-                    fig.add_trace(go.Bar(x=df_ch['Date'], y=df_ch['Cal'], name="熱量", marker_color='#FFD700', opacity=0.6), secondary_y=False)
-                    fig.add_trace(go.Bar(x=df_ch['Date'], y=df_ch['Food'], name="食量", marker_color='#90EE90', opacity=0.6), secondary_y=False)
-                    fig.add_trace(go.Scatter(x=df_ch['Date'], y=df_ch['Water'], name="飲水", line=dict(color='#00BFFF', width=2)), secondary_y=True)
-                    fig.update_layout(height=380, legend=dict(orientation="h", y=-0.25, x=0.5, xanchor="center"), barmode='group', margin=dict(t=10,b=20))
-                    st.plotly_chart(fig, width="stretch")
+                with metrics.span("trend_chart") as sp:
+                    # 直接讀每日彙總表，只碰區間內的日期 (見 summary_store.py)
+                    mirror.ensure_history(d_range[0], d_range[1])  # 只抓區間涵蓋的封存分片
+                    fig, res, sp['rows'] = trend_figure(d_range[0], d_range[1], mirror.summary.version)
+                    if fig is not None:
+                        if res != 'D': st.caption(f"區間較長，以{RES_LABEL[res]}顯示 (色帶為最小–最大)")
+                        st.plotly_chart(fig, width="stretch")
         
-        # 修正 1: 還原「📝 今日營養攝取」標題與內容
-        with st.expander("📝 今日營養攝取", expanded=st.session_state.dash_stat_open): 
-            st.markdown(render_daily_stats_html(day_stats), unsafe_allow_html=True)
-        
-        with st.expander("💊 今日保養與藥品", expanded=st.session_state.dash_med_open):
-            st.markdown(render_supp_med_html(supp_l, med_l), unsafe_allow_html=True)
+        with metrics.span("render_html"):
+            # 修正 1: 還原「📝 今日營養攝取」標題與內容
+            with st.expander("📝 今日營養攝取", expanded=st.session_state.dash_stat_open): 
+                st.markdown(render_daily_stats_html(day_stats), unsafe_allow_html=True)
+            
+            with st.expander("💊 今日保養與藥品", expanded=st.session_state.dash_med_open):
+                st.markdown(render_supp_med_html(supp_l, med_l), unsafe_allow_html=True)
+
+            # 近 7 / 30 天日平均 (截至所選日期)，由日合計增量維護 (見 rolling.py)
+            with st.expander("🩺 近 7 / 30 天平均"):
+                mirror.ensure_history(rec_date - timedelta(days=29), rec_date)
+                st.markdown(render_rolling_html(mirror.rolling.summary(rec_date, body_w), body_w), unsafe_allow_html=True)
+
+        with st.expander("📤 匯出紀錄 (給獸醫)"):
+            e_range = st.date_input("匯出區間", value=(tw_now.date() - timedelta(days=89), tw_now.date()), key="export_range")
+            if isinstance(e_range, tuple) and len(e_range)==2:
+                e0, e1 = e_range
+                tag = f"{e0:%Y%m%d}-{e1:%Y%m%d}"
+                c_d, c_l = st.columns(2)
+                c_d.download_button("⬇️ 每日合計 CSV", lambda e0=e0, e1=e1: export_csv(iter_daily_csv, e0, e1), file_name=f"dawen_daily_{tag}.csv", mime="text/csv", on_click="ignore", width="stretch", key="export_daily")
+                c_l.download_button("⬇️ 明細 CSV", lambda e0=e0, e1=e1: export_csv(iter_log_csv, e0, e1), file_name=f"dawen_log_{tag}.csv", mime="text/csv", on_click="ignore", width="stretch", key="export_log")
+                st.caption("完食/剩食重複紀錄已清除，剩食依比例分攤；磷為 mg")
 
 # --- 右欄：飲食紀錄 ---
 with col_input:
     m_opts = ["第一餐", "第二餐", "第三餐", "第四餐", "第五餐", "第六餐", "第七餐", "第八餐", "第九餐", "第十餐", "點心1", "點心2", "點心3"]
-    m_stat = {m: " (已記)" for m in (df_today['Meal_Name'].unique() if not df_today.empty else [])}
-    if not df_today.empty:
-        for _, r in df_today[df_today['ItemID'].isin(['FINISH', 'WASTE'])].iterrows(): m_stat[r['Meal_Name']] = f" (已記) (完食: {str(r['Time'])[:5]})"
+    m_stat = log_idx.derive(('meal_status', rec_date), lambda snap: meal_status(snap, rec_date))
     if 'meal_selector' not in st.session_state: st.session_state.meal_selector = next((m for m in m_opts if m not in m_stat), m_opts[0])
     
     with st.container(border=True):
         st.markdown("#### 🍽️ 飲食紀錄")
         c_m, c_b = st.columns(2)
         meal_n = c_m.selectbox("餐別", m_opts, format_func=lambda m: f"{m}{m_stat.get(m, '')}", key="meal_selector")
-        df_m = df_today[df_today['Meal_Name'] == meal_n] if not df_today.empty else pd.DataFrame()
+        df_m = log_idx.meal(rec_date, meal_n)
         bowl_w = c_b.number_input("🥣 碗重 (g)", value=float(df_m.iloc[-1]['Bowl_Weight']) if not df_m.empty else 30.0, step=0.1)
         
         # 修正 2: 精確還原查看明細邏輯
@@ -295,9 +321,7 @@ with col_input:
                 st.dataframe(view_df, width="stretch", hide_index=True)
 
         m_stats = {'food':0, 'water':0, 'cal':0, 'prot':0, 'fat':0}
-        if not df_m.empty:
-            df_m_c = clean_duplicate_finish_records(df_m); fm, wm = calculate_intake_breakdown(df_m_c)
-            m_stats.update({'food':fm, 'water':wm, 'cal':df_m_c['Cal_Sub'].sum(), 'prot':df_m_c['Prot_Sub'].sum(), 'fat':df_m_c['Fat_Sub'].sum()})
+        if not df_m.empty: m_stats.update(mirror.summary.meal(rec_date, meal_n))
         
         with st.expander("📊 本餐營養小計", expanded=st.session_state.meal_stats_open):
             st.markdown(render_meal_stats_simple(m_stats), unsafe_allow_html=True)
@@ -305,14 +329,15 @@ with col_input:
         st.divider(); st.markdown('<div id="input-anchor"></div>', unsafe_allow_html=True)
         nav = st.radio("模式", ["➕ 新增", "🏁 完食"], horizontal=True, label_visibility="collapsed", key="nav_mode")
         
-        l_ref_w = st.session_state.cart[-1]['Scale_Reading'] if st.session_state.cart else (float(df_m[~df_m['ItemID'].isin(['WASTE', 'FINISH'])].iloc[-1]['Scale_Reading']) if not df_m.empty and not df_m[~df_m['ItemID'].isin(['WASTE', 'FINISH'])].empty else bowl_w)
-        l_ref_n = st.session_state.cart[-1]['Item_Name'] if st.session_state.cart else (df_m[~df_m['ItemID'].isin(['WASTE', 'FINISH'])].iloc[-1]['Item_Name'] if not df_m.empty and not df_m[~df_m['ItemID'].isin(['WASTE', 'FINISH'])].empty else "碗")
+        df_m_in = df_m[~df_m['Is_Finish']] if not df_m.empty else df_m
+        l_ref_w = st.session_state.cart[-1]['Scale_Reading'] if st.session_state.cart else (float(df_m_in.iloc[-1]['Scale_Reading']) if not df_m_in.empty else bowl_w)
+        l_ref_n = st.session_state.cart[-1]['Item_Name'] if st.session_state.cart else (df_m_in.iloc[-1]['Item_Name'] if not df_m_in.empty else "碗")
 
         if nav == "➕ 新增":
             c1, c2 = st.columns(2)
-            cat = c1.selectbox("類別", ["請選擇..."] + list(df_items['Category'].unique()), key="cat_select")
-            item = c2.selectbox("品名", df_items[df_items['Category']==cat]['Item_Name'].tolist() if cat!="請選擇..." else ["選類別"], key="item_select")
-            unit = unit_map.get(item, "g")
+            cat = c1.selectbox("類別", ["請選擇..."] + catalog.categories, key="cat_select")
+            item = c2.selectbox("品名", catalog.by_category.get(cat, []) if cat!="請選擇..." else ["選類別"], key="item_select")
+            unit = catalog.unit(item)
             
             c3, c4 = st.columns(2)
             with c3:
@@ -335,6 +360,9 @@ with col_input:
             if st.session_state.cart:
                 st.markdown("##### 🛒 待存清單")
                 ed_df = st.data_editor(pd.DataFrame(st.session_state.cart), width="stretch", column_config={"Item_Name": "品名", "Net_Quantity": "淨重", "Cal_Sub": "熱量"}, column_order=["Item_Name", "Net_Quantity", "Cal_Sub"], num_rows="fixed")
+                # 淨重被改過的列，整台購物車一次向量化重算營養素
+                q_edit = (ed_df['Net_Quantity'] != pd.DataFrame(st.session_state.cart)['Net_Quantity']).to_numpy()
+                if q_edit.any(): ed_df.loc[q_edit, ['Cal_Sub', 'Prot_Sub', 'Fat_Sub', 'Phos_Sub']] = catalog.nutrients(ed_df['Item_Name'], ed_df['Net_Quantity'])[q_edit]
                 
                 # 解決刪除需點兩次的問題
                 del_opts = ["請選擇項目刪除..."] + [f"{i+1}. {r['Item_Name']} ({r['Net_Quantity']})" for i, r in ed_df.iterrows()]
@@ -346,7 +374,8 @@ with col_input:
 
                 if st.button("💾 儲存寫入 Google Sheet", type="primary", width="stretch"):
                     rows = [[str(uuid.uuid4()), f"{rec_date.strftime('%Y/%m/%d')} {rec_time_str}:00", rec_date.strftime('%Y/%m/%d'), f"{rec_time_str}:00", meal_n, r['ItemID'], r['Category'], r['Scale_Reading'], r['Bowl_Weight'], r['Net_Quantity'], r['Cal_Sub'], r['Prot_Sub'], r['Fat_Sub'], r['Phos_Sub'], "", r['Item_Name'], ""] for _, r in ed_df.iterrows()]
-                    sheet_log.append_rows(rows); st.toast("✅ 儲存成功"); st.session_state.cart = []; load_data.clear(); st.session_state.just_saved = True; st.rerun()
+                    with metrics.span("save_cart", rows=len(rows)): mirror.journal.enqueue(rows)
+                    st.toast("✅ 已存入本機，背景上傳中"); st.session_state.cart = []; st.session_state.just_saved = True; metrics.end_run(); st.rerun()
 
         elif nav == "🏁 完食":
             f_d = st.date_input("完食日期", value=rec_date); f_t = format_time_str(st.text_input("時間", value=get_tw_time().strftime("%H%M")))
@@ -359,4 +388,20 @@ with col_input:
                 if wn > 0 and not df_m.empty:
                     calc = df_m[(~df_m['Category'].isin(['藥品','保養品'])) & (df_m['Net_Quantity']>0)]
                     if not calc.empty: wc = wn * (calc['Cal_Sub'].sum()/calc['Net_Quantity'].sum()); st.warning(f"📉 剩餘：{wn:.1f}g (約扣 {wc:.1f}kcal)")
-            st.button("💾 紀錄完食", type="primary", width="stretch", on_click=save_finish_callback, args=(f_ty, wn, wc, bowl_w, meal_n, f_t, f_d, rec_date))
\ No newline at end of file
+            locked = mirror.finish_locked(rec_date)
+            if locked: st.caption("🔒 這個日期所在期間已封存，完食紀錄無法再修改")
+            st.button("💾 紀錄完食", type="primary", width="stretch", on_click=save_finish_callback, args=(f_ty, wn, wc, bowl_w, meal_n, f_t, f_d, rec_date), disabled=locked)
+
+# --- 效能除錯面板 ---
+run = metrics.end_run()
+if show_debug and run:
+    with debug_box:
+        st.caption(f"本次 rerun {run['total_ms']:.0f} ms｜Sheets 呼叫 {sum(run['api'].values())} 次 ({run['api_ms']:.0f} ms)")
+        st.dataframe(pd.DataFrame(run['spans'], columns=['name', 'ms', 'rows']), width="stretch", hide_index=True)
+        if run['api']: st.caption("本次呼叫：" + "、".join(f"{k} ×{v}" for k, v in run['api'].items()))
+        st.caption("近 60 秒配額：" + "｜".join(f"{'讀' if k == 'read' else '寫'} {used}/{limit}" for k, (used, limit) in metrics.quota().items()))
+        f_st = mirror.fetcher.status()
+        st.caption(f"同步 TTL {f_st['ttl']:.0f} 秒｜實際抓取 {f_st['fetches']} 次、共用 {f_st['shared']} 次、免抓 {f_st['hits']} 次")
+        bg = dict(metrics.background)
+        if bg: st.caption("背景呼叫累計：" + "、".join(f"{k} ×{v}" for k, v in bg.items()))
+        st.download_button("⬇️ 匯出量測紀錄 (JSONL)", metrics.jsonl(), file_name="dawen_metrics.jsonl", mime="application/jsonl")
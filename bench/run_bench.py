@@ -0,0 +1,129 @@
+# 離線基準測試
+# 用合成資料 (bench/synth.py) 建一張本機假工作表，逐段計時一次模擬 rerun 與存檔路徑，
+# 和 bench/baseline.json 比較；任何一段比基準慢超過容許倍數就以非零結束。
+#
+#   python -m bench.run_bench                    # 預設 1 年與 3 年資料
+#   python -m bench.run_bench --years 1 5 10
+#   python -m bench.run_bench --update-baseline  # 重新記錄基準
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from bench.synth import synth_backend
+from local_store import SheetMirror
+from log_index import LogIndex
+from log_sync import LogSync
+from render import render_daily_stats_html, render_header, render_meal_stats_simple, render_supp_med_html
+from rollup import calculate_intake_breakdown, clean_duplicate_finish_records, rollup
+from summary_store import SummaryStore
+from trend import build_trend
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SLACK_MS = 2.0     # 極短的階段誤差大，低於此值的差距不算退步
+IO_SLACK_MS = 50.0 # 存檔/同步會碰 SQLite 與背景上傳執行緒，抖動較大
+
+def timeit(fn, repeat):
+    out, times = None, []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); out = fn(); times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), out
+
+def legacy_day(df, d):
+    # 舊版 app.py：每次 rerun 逐日布林篩選 + 清重複 + 分攤
+    df_day = df[df['Date'].astype(str) == d.strftime("%Y/%m/%d")].copy()
+    return calculate_intake_breakdown(clean_duplicate_finish_records(df_day))
+
+def bench_years(years, latency, repeat):
+    res = {}
+    backend = synth_backend(years, latency)
+    sheet_log, sheet_db = backend.open()
+    res['full_sync'], log = timeit(lambda: _synced(sheet_log), 1)
+    res['rows'] = log.n_rows
+    tail = [list(r) for r in log.rows[-3:]]
+    res['incremental_sync'], _ = timeit(lambda: (sheet_log.append_rows(tail), log.sync()), repeat)  # 模擬別台裝置新增 3 列
+    df = log.df
+    today = df['D'].max().date()
+    res['index_build'], idx = timeit(lambda: LogIndex(df), repeat)
+    summary = SummaryStore()
+    res['summary_reset'], _ = timeit(lambda: summary.reset(df), repeat)
+    res['day_lookup'], df_today = timeit(lambda: idx.day(today), repeat)
+    res['day_stats'], day_stats = timeit(lambda: summary.day(today), repeat)
+    res['trend_30d'], _ = timeit(lambda: summary.range(today - timedelta(days=29), today), repeat)
+    first = df['D'].min().date()
+    res['trend_figure_all'], _ = timeit(lambda: build_trend(summary.range(first, today), first, today), repeat)
+    legacy = df.assign(Date=df['Date'].astype(str), Category=df['Category'].astype(str), ItemID=df['ItemID'].astype(str), Meal_Name=df['Meal_Name'].astype(str))
+    res['legacy_trend_30d'], _ = timeit(lambda: [legacy_day(legacy, today - timedelta(days=i)) for i in range(30)], 1)
+    res['legacy_day'], _ = timeit(lambda: legacy_day(legacy, today), repeat)
+    res['rollup_all'], _ = timeit(lambda: rollup(df, 'D'), 1)
+    supp = [{'name': n, 'count': c} for n, c in df_today[df_today['Category'] == '保養品']['Item_Name'].astype(str).value_counts().items()]
+    med = [{'name': n, 'count': c} for n, c in df_today[df_today['Category'] == '藥品']['Item_Name'].astype(str).value_counts().items()]
+    res['render_html'], _ = timeit(lambda: (render_header(str(today)), render_daily_stats_html(day_stats), render_supp_med_html(supp, med), render_meal_stats_simple(day_stats)), repeat)
+    res.update(bench_save(backend, today))
+    return res
+
+def _synced(ws):
+    log = LogSync(ws); log.sync()
+    return log
+
+def bench_save(backend, today):
+    # 存檔路徑：購物車寫入日誌 (使用者等待的部分) + 背景上傳；完食 upsert
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = SheetMirror(backend.open, os.path.join(tmp, "mirror.sqlite"))
+        mirror.ready.wait()
+        ds = today.strftime("%Y/%m/%d")
+        cart = lambda: [[str(uuid.uuid4()), f"{ds} 12:00:00", ds, "12:00:00", "第一餐", "F001", "主食", 80, 30, 50, 55, 11.5, 0.75, 0.11, "", "雞胸肉", ""] for _ in range(5)]
+        res['save_cart_enqueue'], _ = timeit(lambda: mirror.journal.enqueue(cart()), 9)
+        res['save_cart_flush'], _ = timeit(lambda: mirror._flush_rows(cart()), 5)
+        fin = lambda: [str(uuid.uuid4()), f"{ds} 13:00:00", ds, "13:00:00", "第一餐", "FINISH", "完食", 0, 30, 0, 0, 0, 0, 0, "", "完食紀錄", "13:00"]
+        res['save_finish'], _ = timeit(lambda: mirror.log.upsert_finish(fin()), 5)
+    return res
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="大文飲食日記離線基準測試")
+    ap.add_argument("--years", type=int, nargs="+", default=[1, 3])
+    ap.add_argument("--latency", type=float, default=0.0, help="假工作表每次呼叫的延遲 (秒)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--tolerance", type=float, default=1.5, help="比基準慢幾倍算退步")
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for y in args.years:
+        print(f"🚀 {y} 年資料 ...", flush=True)
+        results[f"{y}y"] = bench_years(y, args.latency, args.repeat)
+    baseline = json.load(open(BASELINE, encoding="utf-8")) if os.path.exists(BASELINE) else {}
+
+    failed = []
+    for key, res in results.items():
+        print(f"\n== {key} ({res['rows']} 列) ==")
+        base = baseline.get(key, {})
+        for stage, ms in res.items():
+            if stage == 'rows': continue
+            ref = base.get(stage)
+            flag = ""
+            slack = IO_SLACK_MS if stage.startswith('save_') or stage.endswith('_sync') else SLACK_MS
+            if ref is not None and not args.update_baseline and ms > ref * args.tolerance + slack:
+                flag = "  ❌ 退步"; failed.append(f"{key}.{stage}")
+            print(f"{stage:<20}{ms:>10.2f} ms" + (f"   (基準 {ref:.2f})" if ref is not None else "") + flag)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(BASELINE, "w", encoding="utf-8") as f: json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n已更新基準：{BASELINE}")
+        return 0
+    if failed:
+        print(f"\n❌ 退步：{', '.join(failed)}")
+        return 1
+    print("\n✅ 全部在基準範圍內")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
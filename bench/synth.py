@@ -0,0 +1,69 @@
+# 合成資料產生器
+# 產生擬真的 Log_Data / DB_Items：每天多餐、食物+飲水、部分餐有剩食或完食紀錄
+# (含舊版留下的重複完食列)、每日保養品與不定期藥品。欄位順序與 app.py 寫入時相同。
+
+import random
+import uuid
+from datetime import date, timedelta
+
+from storage import ITEMS_HEADER, FakeBackend
+
+MEALS = ["第一餐", "第二餐", "第三餐", "第四餐", "第五餐", "第六餐", "第七餐", "第八餐", "點心1", "點心2"]
+
+def synth_items():
+    items = [
+        ["F001", "雞胸肉", "主食", 110, 23, 1.5, 0.22, "g"], ["F002", "鮪魚罐", "主食", 90, 16, 2.5, 0.2, "g"],
+        ["F003", "鮭魚泥", "主食", 140, 20, 6, 0.25, "g"], ["F004", "腎臟處方罐", "主食", 105, 7, 6, 0.08, "g"],
+        ["D001", "乾飼料", "乾糧", 380, 34, 16, 1.0, "g"], ["D002", "低磷乾糧", "乾糧", 390, 28, 18, 0.5, "g"],
+        ["T001", "肉泥條", "零食", 12, 1, 0.5, 0.02, "條"], ["T002", "凍乾", "零食", 350, 70, 8, 0.9, "g"],
+        ["W001", "水", "水", 0, 0, 0, 0, "ml"], ["W002", "飲用水", "飲用水", 0, 0, 0, 0, "ml"],
+        ["S001", "魚油", "保養品", 10, 0, 1, 0, "顆"], ["S002", "益生菌", "保養品", 2, 0, 0, 0, "包"],
+        ["S003", "離胺酸", "保養品", 1, 0, 0, 0, "顆"], ["M001", "腸胃藥", "藥品", 0, 0, 0, 0, "顆"],
+        ["M002", "磷結合劑", "藥品", 0, 0, 0, 0, "包"], ["M003", "皮下點滴", "藥品", 0, 0, 0, 0, "次"],
+    ]
+    return [list(ITEMS_HEADER)] + items
+
+def synth_log(years=1, meals_per_day=6, start=None, seed=42):
+    # 回傳不含標題的列 (list of list)
+    rng = random.Random(seed)
+    items = {r[1]: r for r in synth_items()[1:]}
+    foods = [n for n, r in items.items() if r[2] in ("主食", "乾糧", "零食")]
+    waters = [n for n, r in items.items() if r[2] in ("水", "飲用水")]
+    supps = [n for n, r in items.items() if r[2] == "保養品"]
+    meds = [n for n, r in items.items() if r[2] == "藥品"]
+    start = start or date.today() - timedelta(days=int(365 * years))
+    rows = []
+
+    def row(d, t, meal, name, sc, bowl, net):
+        it = items[name]
+        mult = net / 100 if it[7] in ("g", "ml") else 1
+        ds = d.strftime("%Y/%m/%d")
+        return [str(uuid.UUID(int=rng.getrandbits(128))), f"{ds} {t}:00", ds, f"{t}:00", meal, it[0], it[2], round(sc, 1), bowl, round(net, 1),
+                round(it[3] * mult, 2), round(it[4] * mult, 2), round(it[5] * mult, 2), round(it[6] * mult, 3), "", name, ""]
+
+    for day in range(int(365 * years)):
+        d = start + timedelta(days=day)
+        for m_i, meal in enumerate(MEALS[:meals_per_day]):
+            t = f"{6 + m_i * 3 % 18:02d}:{rng.randint(0, 59):02d}"
+            bowl, sc = 30.0, 30.0
+            for _ in range(rng.randint(1, 3)):
+                net = rng.uniform(10, 60)
+                sc += net
+                rows.append(row(d, t, meal, rng.choice(foods), sc, bowl, net))
+            if rng.random() < 0.5:
+                net = rng.uniform(5, 30); sc += net
+                rows.append(row(d, t, meal, rng.choice(waters), sc, bowl, net))
+            if m_i == 0:
+                for s in rng.sample(supps, rng.randint(1, 2)): rows.append(row(d, t, meal, s, sc, bowl, 1))
+                if rng.random() < 0.3: rows.append(row(d, t, meal, rng.choice(meds), sc, bowl, 1))
+            r = rng.random()
+            if r < 0.8:
+                for _ in range(2 if rng.random() < 0.05 else 1):  # 舊版偶有重複完食列
+                    waste = rng.uniform(1, 15) if r < 0.3 else 0
+                    ds = d.strftime("%Y/%m/%d")
+                    rows.append([str(uuid.UUID(int=rng.getrandbits(128))), f"{ds} {t}:00", ds, f"{t}:00", meal, "WASTE" if waste else "FINISH",
+                                 "剩食" if waste else "完食", 0, bowl, -round(waste, 1), -round(waste * 1.2, 1), 0, 0, 0, "", "完食紀錄", t])
+    return rows
+
+def synth_backend(years=1, latency=0.0, seed=42):
+    return FakeBackend(log_rows=synth_log(years, seed=seed), items=synth_items()[1:], latency=latency, read_per_min=0, write_per_min=0)
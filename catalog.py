@@ -0,0 +1,54 @@
+# 品項目錄
+# DB_Items 編譯成一次：每個品項一筆 __slots__ 紀錄 (營養值已轉成 float)、依類別分組，
+# 以內容雜湊當版本，DB_Items 沒變就不重建。整台購物車的營養素可一次向量化計算。
+
+import hashlib
+import json
+
+import numpy as np
+
+WEIGHED_UNITS = ("g", "ml")  # 以每 100g/ml 計算；其他單位 (顆、包…) 每次固定一份
+
+def _num(v):
+    try: return float(v) if v not in (None, "") else 0.0
+    except (ValueError, TypeError): return 0.0
+
+def content_version(header, rows):
+    return hashlib.sha1(json.dumps([header, rows], ensure_ascii=False, default=str).encode()).hexdigest()[:12]
+
+class CatalogItem:
+    __slots__ = ('item_id', 'name', 'category', 'cal', 'prot', 'fat', 'phos', 'unit')
+
+    def __init__(self, item_id, name, category, cal, prot, fat, phos, unit):
+        self.item_id, self.name, self.category, self.unit = item_id, name, category, unit
+        self.cal, self.prot, self.fat, self.phos = cal, prot, fat, phos
+
+class Catalog:
+    def __init__(self, df_items, version=None):
+        self.version = version
+        self.items, self.by_category = {}, {}
+        if df_items.empty: self.categories, self._nutr, self._pos = [], np.zeros((0, 4)), {}; return
+        df = df_items.rename(columns=lambda c: str(c).strip())
+        for r in df.itertuples(index=False):
+            it = CatalogItem(r.ItemID, r.Item_Name, r.Category, _num(r.Ref_Cal_100g), _num(r.Protein_Pct), _num(r.Fat_Pct), _num(r.Phos_Pct), r.Unit_Type or "g")
+            self.items[it.name] = it
+        self.categories = list(dict.fromkeys(it.category for it in self.items.values()))
+        for it in self.items.values(): self.by_category.setdefault(it.category, []).append(it.name)
+        self._pos = {name: i for i, name in enumerate(self.items)}
+        self._nutr = np.array([[it.cal, it.prot, it.fat, it.phos] for it in self.items.values()], dtype=float)
+
+    def get(self, name):
+        return self.items.get(name)
+
+    def unit(self, name, default="g"):
+        it = self.items.get(name)
+        return it.unit if it is not None else default
+
+    def nutrients(self, names, net_qty):
+        # 回傳 (n, 4)：熱量、蛋白質、脂肪、磷；g/ml 依淨重/100 計，其他單位固定一份，未知品項為 0
+        idx = np.array([self._pos.get(n, -1) for n in names], dtype=int)
+        base, hit = np.zeros((len(idx), 4)), idx >= 0
+        base[hit] = self._nutr[idx[hit]]
+        weighed = np.array([self.unit(n) in WEIGHED_UNITS for n in names], dtype=bool)
+        mult = np.where(weighed, np.asarray(net_qty, dtype=float) / 100, 1.0)
+        return base * mult[:, None]
@@ -0,0 +1,70 @@
+# 抓取協調器 (single-flight)
+# 整個 process 共用一個：同時有多個 session 要同步時只發一次抓取，其他人等它完成後共用結果。
+# TTL 隨狀況調整：剛寫入後短 (盡快對帳)，閒置且連續幾次都沒變動就逐步拉長，有變動再縮回。
+# 任何 session 存檔時呼叫 invalidate()，下一個讀取者立即重抓，不必等 TTL 到期。
+
+import threading
+import time
+
+MIN_TTL = 2.0          # 剛寫入後
+BASE_TTL = 5.0         # 一般
+MAX_TTL = 60.0         # 長時間沒有變動
+WRITE_BOOST_SEC = 30   # 寫入後多久內維持短 TTL
+
+class FetchCoordinator:
+    # fetch()：實際抓取；version()：資料版本，用來判斷這次抓取有沒有帶來變動
+    def __init__(self, fetch, version=None, min_ttl=MIN_TTL, base_ttl=BASE_TTL, max_ttl=MAX_TTL, write_boost_sec=WRITE_BOOST_SEC):
+        self.fetch, self.version = fetch, version or (lambda: None)
+        self.min_ttl, self.base_ttl, self.max_ttl, self.write_boost_sec = min_ttl, base_ttl, max_ttl, write_boost_sec
+        self.cond = threading.Condition()
+        self.inflight, self.dirty = False, True
+        self.result, self.error = None, None
+        self.last_done, self.last_write = 0.0, 0.0
+        self.idle_ttl = base_ttl
+        self.stats = {'fetches': 0, 'shared': 0, 'hits': 0}
+
+    def ttl(self):
+        if time.monotonic() - self.last_write < self.write_boost_sec: return self.min_ttl
+        return self.idle_ttl
+
+    def invalidate(self, wrote=True):
+        with self.cond:
+            self.dirty = True
+            if wrote: self.last_write = time.monotonic()
+
+    def get(self, force=False):
+        with self.cond:
+            if force: self.dirty = True
+            joined = False
+            while True:
+                if self.inflight:
+                    self.cond.wait_for(lambda: not self.inflight); joined = True
+                    continue
+                if joined and not self.dirty:
+                    # 共用剛完成的那次抓取；它失敗就一起收到錯誤
+                    self.stats['shared'] += 1
+                    if self.error is not None: raise self.error
+                    return self.result
+                if not self.dirty and self.error is None and time.monotonic() - self.last_done < self.ttl():
+                    self.stats['hits'] += 1; return self.result
+                self.inflight, self.dirty = True, False
+                break
+        before = self.version()
+        try:
+            result, error = self.fetch(), None
+        except Exception as e:
+            result, error = None, e
+        with self.cond:
+            self.inflight = False
+            self.result, self.error = result, error
+            if error is None: self.last_done = time.monotonic()  # 失敗不起算 TTL：下一個讀取者直接重試
+            self.stats['fetches'] += 1
+            # 沒帶來變動就拉長閒置 TTL，有變動 (或失敗) 縮回
+            self.idle_ttl = min(self.idle_ttl * 2, self.max_ttl) if error is None and self.version() == before else self.base_ttl
+            self.cond.notify_all()
+        if error is not None: raise error
+        return result
+
+    def status(self):
+        with self.cond:
+            return {'ttl': self.ttl(), 'inflight': self.inflight, 'age': time.monotonic() - self.last_done if self.last_done else None, **self.stats}
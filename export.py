@@ -0,0 +1,78 @@
+# 飲食紀錄匯出 (給獸醫的報告)
+# 依日期分段 (預設 31 天) 走 ExportView：每段套用與彙總相同的規則 (同一餐的完食/剩食只留最後一筆、
+# 剩食依投入比例分攤)，編成 CSV bytes 後 yield。
+# ExportView = 共用 log 快照 (log_index.py) + 尚未載入的封存分片；分片逐張讀取、同時只留一張，
+# 不放進 ShardSet.loaded，也不因此重建共用快照。產生的 CSV bytes 本身仍與匯出區間成正比。
+# 分段邊界落在日期之間且不跨封存期間，同一天同一餐的紀錄一定在同一段，逐段去重與整份計算結果相同。
+# CSV 以 UTF-8 BOM 開頭，Excel 直接開中文不會亂碼。Parquet 需要 pyarrow (未列入相依套件)，目前只提供 CSV。
+
+import io
+from datetime import date, timedelta
+
+import pandas as pd
+
+from log_index import LogIndex
+from rollup import finish_keep_mask, rollup
+from schema import DERIVED_COLS, concat_log
+from shards import period_end, period_of
+
+CHUNK_DAYS = 31
+BOM = "\ufeff".encode("utf-8")
+DAILY_HEADER = ['Date', 'cal', 'food', 'water', 'prot', 'fat', 'phos_mg']
+
+def _csv(df, header=False):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=header, lineterminator="\n")
+    return buf.getvalue().encode("utf-8")
+
+class ExportView:
+    # shards=None 表示只有快照 (不分片)
+    def __init__(self, snap, shards=None, d0=None, d1=None):
+        self.snap, self.shards, self.columns = snap, shards, snap.df.columns
+        self.need = set(shards.periods_for(d0, d1)) - set(shards.loaded) if shards is not None else set()
+        self.cur, self.arch = None, None
+
+    def window_end(self, d):
+        # 分段不跨封存期間：每段最多碰一張分片
+        return period_end(period_of(d, self.shards.freq)) if self.need else date.max
+
+    def range(self, d0, d1):
+        df = self.snap.range(d0, d1)
+        p = period_of(d0, self.shards.freq) if self.need else None
+        if p not in self.need: return df
+        if p != self.cur:
+            self.arch = None  # 換期間：先放掉上一張再讀下一張
+            self.arch, self.cur = LogIndex(self.shards.read(p)), p
+        arch = self.arch.range(d0, d1)
+        if df.empty: return arch
+        arch = arch[~arch['UUID'].astype(str).isin(df['UUID'].astype(str))]  # 封存途中還留在 Log_Data 的列以熱分片為準
+        return concat_log([arch, df])
+
+def chunks(src, d0, d1, days=CHUNK_DAYS):
+    # [d0, d1] 每 days 天一段 (不跨封存期間)，回傳該段的列；沒有紀錄的段落略過
+    s = d0
+    while s <= d1:
+        e = min(s + timedelta(days=days - 1), d1, src.window_end(s))
+        df = src.range(s, e)
+        if not df.empty: yield df
+        s = e + timedelta(days=1)
+
+def clean(df):
+    # 同日同餐的完食/剩食紀錄只留最後一筆
+    return df.iloc[finish_keep_mask(df, ['D', 'Meal_Name'])]
+
+def iter_log_csv(src, d0, d1, days=CHUNK_DAYS):
+    # 清理後的明細，欄位同 Log_Data 工作表
+    cols = [c for c in src.columns if c not in DERIVED_COLS]
+    yield BOM + _csv(pd.DataFrame(columns=cols), header=True)
+    for df in chunks(src, d0, d1, days): yield _csv(clean(df)[cols])
+
+def iter_daily_csv(src, d0, d1, days=CHUNK_DAYS):
+    # 每日合計；磷換算成 mg (同 rolling.py)
+    yield BOM + _csv(pd.DataFrame(columns=DAILY_HEADER), header=True)
+    for df in chunks(src, d0, d1, days):
+        g = rollup(df, 'D')
+        g['phos_mg'] = g.pop('phos') * 1000
+        g = g.round(2)
+        g.insert(0, 'Date', g.index.strftime("%Y/%m/%d"))
+        yield _csv(g[DAILY_HEADER])
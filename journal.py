@@ -0,0 +1,140 @@
+# 寫入日誌 (write-behind)
+# 存檔先寫進本機 SQLite 日誌立即返回；背景執行緒批次上傳到 Sheets，
+# 失敗時以指數退避重試 (tenacity)。上傳前比對 UUID，已在表上的列不會重複寫入。
+# 一批重試用盡後不擋住後面的批次：對半拆開各送一次，找出真正寫不進去的列。
+# 同一輪有其他列成功 (後端正常) 而某列單獨仍失敗，記一次 strike，累積 DEAD_AFTER 次移到待處理區 (dead)，
+# 不再自動重試也不疊加到畫面，側欄顯示筆數，可手動放回佇列。
+# 拆開後兩半都失敗且這一輪還沒有任何成功，先往前半再拆 PROBE_LEVELS 層試探；仍全數失敗就視為整體連不上
+# (離線、配額)，這一輪先停，也不記 strike。
+
+import json
+import sqlite3
+import threading
+import time
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+FLUSH_INTERVAL_SEC = 30   # 沒有新資料時多久檢查一次 (上次失敗的列也會在此時重試)
+KEEP_FLUSHED_SEC = 86400  # 已上傳的紀錄保留一天方便追查
+DEAD_AFTER = 3            # 單獨上傳失敗幾輪後移到待處理區
+SPLIT_BUDGET = 32         # 每輪拆批最多多送幾次
+PROBE_LEVELS = 2          # 還沒有任何成功時，兩半都失敗後再往下試探幾層
+
+def _plain(v):
+    # numpy 數值 (來自 DataFrame) 轉成 JSON 可序列化的型別
+    return v.item() if hasattr(v, 'item') else str(v)
+
+class WriteJournal:
+    # flush(rows)：實際寫入並回傳成功寫入的 UUID；on_change()：待上傳列有變動時通知
+    # start=False 不啟動背景執行緒，由呼叫端自行 flush_pending() (測試用)
+    def __init__(self, flush, path, on_change=None, batch_size=200, retry_attempts=5, start=True):
+        self.path, self.flush, self.on_change = path, flush, on_change
+        self.batch_size, self.retry_attempts = batch_size, retry_attempts
+        self.wake = threading.Event()
+        self.last_error, self.last_flush = None, None
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS journal (uuid TEXT PRIMARY KEY, data TEXT, created REAL, flushed REAL, attempts INTEGER DEFAULT 0, last_error TEXT, strikes INTEGER DEFAULT 0, dead REAL)")
+            cols = {r[1] for r in c.execute("PRAGMA table_info(journal)")}
+            for col, decl in (('strikes', 'INTEGER DEFAULT 0'), ('dead', 'REAL')):
+                if col not in cols: c.execute(f"ALTER TABLE journal ADD COLUMN {col} {decl}")  # 舊版日誌補欄位
+        self.wake.set()  # 啟動時先把上次沒傳完的列送出
+        if start: threading.Thread(target=self._worker, daemon=True).start()
+
+    def _conn(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def enqueue(self, rows):
+        now = time.time()
+        with self._conn() as c:
+            c.executemany("INSERT OR IGNORE INTO journal (uuid, data, created) VALUES (?,?,?)",
+                          [(str(r[0]), json.dumps(list(r), ensure_ascii=False, default=_plain), now) for r in rows])
+        self._changed()
+        self.wake.set()
+
+    def pending_rows(self):
+        with self._conn() as c:
+            return [json.loads(d) for (d,) in c.execute("SELECT data FROM journal WHERE flushed IS NULL AND dead IS NULL ORDER BY created, rowid")]
+
+    def dead_rows(self):
+        # 待處理區：[(列, 最後錯誤)]
+        with self._conn() as c:
+            return [(json.loads(d), e) for d, e in c.execute("SELECT data, last_error FROM journal WHERE flushed IS NULL AND dead IS NOT NULL ORDER BY created, rowid")]
+
+    def requeue_dead(self):
+        # 使用者確認後把待處理區的列放回佇列重試
+        with self._conn() as c:
+            n = c.execute("UPDATE journal SET dead=NULL, strikes=0 WHERE flushed IS NULL AND dead IS NOT NULL").rowcount
+        if n: self._changed(); self.wake.set()
+        return n
+
+    def status(self):
+        with self._conn() as c:
+            pending, dead = c.execute("SELECT COUNT(*) - COUNT(dead), COUNT(dead) FROM journal WHERE flushed IS NULL").fetchone()
+            dead_error = c.execute("SELECT last_error FROM journal WHERE flushed IS NULL AND dead IS NOT NULL ORDER BY dead DESC LIMIT 1").fetchone() if dead else None
+        return {'pending': pending, 'dead': dead, 'dead_error': dead_error[0] if dead_error else None, 'last_flush': self.last_flush, 'last_error': self.last_error}
+
+    def _changed(self):
+        if self.on_change is not None: self.on_change()
+
+    def _worker(self):
+        while True:
+            self.wake.wait(FLUSH_INTERVAL_SEC); self.wake.clear()
+            try: self.flush_pending()
+            except Exception as e: self.last_error = f"{type(e).__name__}: {e}"  # 列仍留在日誌等下次重試
+
+    def _send(self, batch, retry=False):
+        # 上傳一批；成功就標記已上傳，失敗記下錯誤
+        try:
+            if retry:
+                for attempt in Retrying(stop=stop_after_attempt(self.retry_attempts), wait=wait_exponential(multiplier=1, min=1, max=30), reraise=True):
+                    with attempt: done = self.flush(batch)
+            else: done = self.flush(batch)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        now = time.time()
+        with self._conn() as c:
+            c.executemany("UPDATE journal SET flushed=? WHERE uuid=?", [(now, u) for u in done])
+            c.execute("DELETE FROM journal WHERE flushed IS NOT NULL AND flushed < ?", (now - KEEP_FLUSHED_SEC,))
+        self.last_flush = now
+        self._changed()
+        return True
+
+    def _bisect(self, batch, state):
+        # batch 已整批失敗：對半各送一次 (不重試)，回傳仍失敗的子批；單列失敗記到 state['alone']
+        if len(batch) == 1:
+            state['alone'].append(str(batch[0][0])); return [batch]
+        out, bad = [], []
+        for half in (batch[:len(batch) // 2], batch[len(batch) // 2:]):
+            if state['budget'] <= 0: out.append(half); continue
+            state['budget'] -= 1
+            if self._send(half): state['ok'] = True
+            else: bad.append(half)
+        if len(bad) == 2 and not state['ok']:
+            # 可能兩半各有壞列，也可能整體連不上：只往前半試探
+            if state['probe'] <= 0: return out + bad
+            state['probe'] -= 1
+            out += self._bisect(bad[0], state)
+            return out + (self._bisect(bad[1], state) if state['ok'] else [bad[1]])
+        for half in bad: out += self._bisect(half, state)
+        return out
+
+    def flush_pending(self):
+        # 回傳這一輪仍未上傳的列數 (不含移到待處理區的)
+        rows, failed = self.pending_rows(), []
+        state = {'ok': False, 'budget': SPLIT_BUDGET, 'probe': PROBE_LEVELS, 'alone': []}
+        for s in range(0, len(rows), self.batch_size):
+            batch = rows[s:s + self.batch_size]
+            if failed and not state['ok']: failed.append(batch); continue  # 連不上：這一輪先停
+            if self._send(batch, retry=True): state['ok'] = True
+            else: failed += self._bisect(batch, state)
+        if not failed:
+            self.last_error = None; return 0
+        with self._conn() as c:
+            c.executemany("UPDATE journal SET attempts = attempts + 1, last_error=? WHERE uuid=?", [(self.last_error, str(r[0])) for g in failed for r in g])
+            if state['ok']:
+                c.executemany("UPDATE journal SET strikes = strikes + 1 WHERE uuid=?", [(u,) for u in state['alone']])
+                dead = c.execute("UPDATE journal SET dead=? WHERE flushed IS NULL AND dead IS NULL AND strikes >= ?", (time.time(), DEAD_AFTER)).rowcount
+            else: dead = 0
+        if dead: self._changed()
+        return sum(len(g) for g in failed) - dead
@@ -0,0 +1,212 @@
+# 本機持久快照 (SQLite)
+# Log_Data / DB_Items 的原始列存一份在本機：冷啟動直接用快照畫面，
+# 背景再與 Google Sheets 對帳；寫入時同步寫一份到快照 (write-through)。
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from catalog import Catalog, content_version
+from coordinator import FetchCoordinator
+from journal import WriteJournal
+from log_index import LogIndex
+from log_sync import REV_HEADER, REV_SHEET, LogSync, rows_to_frame
+from schema import concat_log
+from rolling import RollingStats
+from shards import ShardSet
+from summary_store import SummaryStore
+
+LOCAL_DB = os.environ.get("DAWEN_LOCAL_DB", os.path.join(".cache", "dawen_mirror.sqlite"))
+
+class LocalStore:
+    def __init__(self, path=LOCAL_DB):
+        self.path = path
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS meta (sheet TEXT PRIMARY KEY, header TEXT, saved_at REAL)")
+            c.execute("CREATE TABLE IF NOT EXISTS rows (sheet TEXT, pos INTEGER, data TEXT, PRIMARY KEY (sheet, pos))")
+
+    def _conn(self):
+        # 每次操作開新連線，背景執行緒與 session 執行緒互不干擾
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, sheet):
+        with self._conn() as c:
+            m = c.execute("SELECT header FROM meta WHERE sheet=?", (sheet,)).fetchone()
+            if m is None: return None, []
+            rows = [json.loads(d) for (d,) in c.execute("SELECT data FROM rows WHERE sheet=? ORDER BY pos", (sheet,))]
+        return json.loads(m[0]), rows
+
+    def save(self, sheet, header, rows):
+        with self._conn() as c:
+            c.execute("DELETE FROM rows WHERE sheet=?", (sheet,))
+            c.executemany("INSERT INTO rows VALUES (?,?,?)", [(sheet, i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows)])
+            c.execute("INSERT OR REPLACE INTO meta VALUES (?,?,?)", (sheet, json.dumps(header, ensure_ascii=False), time.time()))
+
+    def append(self, sheet, rows):
+        with self._conn() as c:
+            start = c.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM rows WHERE sheet=?", (sheet,)).fetchone()[0]
+            c.executemany("INSERT INTO rows VALUES (?,?,?)", [(sheet, start + i, json.dumps(r, ensure_ascii=False)) for i, r in enumerate(rows)])
+            c.execute("UPDATE meta SET saved_at=? WHERE sheet=?", (time.time(), sheet))
+
+    def replace(self, sheet, pos, row):
+        with self._conn() as c:
+            c.execute("UPDATE rows SET data=? WHERE sheet=? AND pos=?", (json.dumps(row, ensure_ascii=False), sheet, pos))
+
+class SheetMirror:
+    # connect: 無參數函式，回傳 (sheet_log, sheet_db)；在背景執行緒呼叫
+    # open_shard: 取得其他工作表 (封存分片/manifest 見 shards.py、修訂標記 Log_Meta 見 log_sync.py)；None 表示不分片也不檢查修訂
+    def __init__(self, connect, path=LOCAL_DB, open_shard=None):
+        self.connect = connect
+        self.store = LocalStore(path)
+        self.lock = threading.RLock()
+        self.sheet_log = self.sheet_db = None
+        self.error = None
+        self.ready = threading.Event()
+        self.log = LogSync(None, store=self.store)
+        self.summary = SummaryStore()  # 每日/每餐彙總，隨 log 變動增量更新
+        self.rolling = RollingStats()  # 近 7 / 30 天平均，隨日合計變動更新
+        self.summary.add_listener(self.rolling)
+        self.log.add_listener(self.summary)
+        h, rows = self.store.load("DB_Items")
+        self.items_df = rows_to_frame(h, rows) if h else pd.DataFrame()
+        self.catalog = Catalog(self.items_df, content_version(h, rows))  # DB_Items 內容變了才重建
+        self.pending_df, self.pending_version = pd.DataFrame(), 0  # 待上傳列；每次重算版本 +1 (快照快取鍵)
+        self._pending_lock = threading.Lock()
+        self.open_shard = open_shard
+        self.shards = ShardSet(open_shard, self.store) if open_shard is not None else None
+        self._manifest_at, self._archive_checked, self.archive_status = None, None, None
+        self._index, self._index_key = None, None
+        self._index_lock = threading.Lock()  # 不共用 self.lock：背景對帳 (連線、下載) 期間照樣可以拿快照
+        self.fetcher = FetchCoordinator(self.refresh, version=lambda: (self.log.version, self.catalog.version))  # 各 session 共用一次抓取
+        self.journal = WriteJournal(self._flush_rows, path, on_change=self._pending_changed)  # 購物車存檔走寫入日誌
+        self._pending_changed()
+        threading.Thread(target=self.fetcher.get, daemon=True).start()
+
+    def has_snapshot(self):
+        return bool(self.log.header) and not self.items_df.empty
+
+    def refresh(self):
+        # 與 Google Sheets 對帳；失敗時保留快照 (離線模式) 並記錄錯誤
+        with self.lock:
+            try:
+                if self.sheet_log is None:
+                    self.sheet_log, self.sheet_db = self.connect()
+                    self.log.ws = self.sheet_log
+                    if self.open_shard is not None: self.log.meta = self.open_shard(REV_SHEET, REV_HEADER)
+                values = self.sheet_db.get_all_values()
+                if values:
+                    h = [c.strip() for c in values[0]]
+                    version = content_version(h, values[1:])
+                    if version != self.catalog.version:
+                        self.store.save("DB_Items", h, values[1:])
+                        self.items_df = rows_to_frame(h, values[1:])
+                        self.catalog = Catalog(self.items_df, version)
+                self.log.sync()
+                if self.shards is not None: self._check_shards()
+                self.error = None
+            except Exception as e:
+                self.error = e
+            finally:
+                self.ready.set()
+        return self.error is None
+
+    # --- 封存分片 ---
+    def _check_shards(self):
+        # Log_Data 整張重抓過 (可能有別的裝置封存) 才重讀 manifest；每天檢查一次是否有可封存的期間
+        if self._manifest_at != self.log.stats['full']:
+            self.shards.load_manifest(); self._manifest_at = self.log.stats['full']
+            self._archives_changed()
+        today = time.strftime("%Y/%m/%d")
+        if self._archive_checked != today and self.shards.due(self.log):
+            self._archive_checked = today
+            threading.Thread(target=self.archive_closed, daemon=True).start()
+
+    def archive_closed(self):
+        # 背景執行緒；log.lock 只在對帳與刪列時短暫持有 (見 ShardSet.archive)
+        try:
+            moved = self.shards.archive(self.log)
+            status = f"已封存 {moved} 筆舊紀錄" if moved else None
+        except Exception as e:
+            moved, status = 0, f"封存失敗：{e}"  # 下次重跑會以 UUID 去重接續
+        self._archives_changed()
+        self.archive_status = status
+        return moved
+
+    def ensure_history(self, d0, d1):
+        # 查詢範圍涵蓋封存期間時，平行抓取需要的分片並併入彙總表與快照
+        if self.shards is None: return False
+        try: changed = self.shards.ensure(d0, d1)
+        except Exception as e:
+            self.error = e; return False
+        if changed: self._archives_changed()
+        return changed
+
+    def _archive_frame(self):
+        # 已載入的封存列；封存途中 (或中途失敗) 還留在 Log_Data 的列以熱分片為準
+        arch = self.shards.frame() if self.shards is not None else pd.DataFrame()
+        if arch.empty or self.log.df.empty: return arch
+        return arch[~arch['UUID'].astype(str).isin(self.log.df['UUID'].astype(str))]
+
+    def _archives_changed(self):
+        self.summary.set_archive(self._archive_frame())
+
+    def sync(self, force=False):
+        # 各 session 每次 rerun 呼叫；背景對帳還沒完成時先用快照，不排隊等
+        if not self.ready.is_set(): return self.error is None
+        return self.fetcher.get(force)
+
+    def worksheets(self):
+        # 寫入路徑需要真的連線：等背景連線完成，仍未連上就重試一次
+        self.ready.wait()
+        if self.sheet_log is None and not self.refresh(): raise self.error
+        return self.sheet_log, self.sheet_db
+
+    def finish_locked(self, d):
+        # 已封存期間的完食紀錄不能再改：舊紀錄在分片裡，熱分片 upsert 找不到它，會多出第二筆完食/剩食
+        return self.shards is not None and self.shards.closed(d)
+
+    def upsert_finish(self, row):
+        if self.finish_locked(datetime.strptime(row[2], "%Y/%m/%d").date()): raise ValueError(f"{row[2]} 所在期間已封存，完食紀錄無法修改")
+        self.worksheets(); self.log.upsert_finish(row)
+
+    def _flush_rows(self, rows):
+        # 日誌背景上傳：先增量同步，已在表上的 UUID 不重複寫 (上次可能寫成功但沒收到回應)
+        sheet_log, _ = self.worksheets()
+        with self.log.lock:
+            self.log.sync()
+            have = self.log.known_uuids([str(r[0]) for r in rows])
+            new = [r for r in rows if str(r[0]) not in have]
+            if new:
+                sheet_log.append_rows(new); self.log.apply_local(new)
+        self.fetcher.invalidate()
+        return [str(r[0]) for r in rows]
+
+    def _pending_changed(self):
+        # 待上傳列疊加到讀取結果與彙總表；日誌執行緒與 session 都會呼叫，依序處理以免舊結果蓋掉新的
+        with self._pending_lock:
+            rows = [[str(c) for c in r] for r in self.journal.pending_rows()]
+            if rows and self.log.header:
+                have = self.log.known_uuids([r[0] for r in rows])
+                rows = [r for r in rows if r[0] not in have]
+            self.pending_df = self.log.frame(rows) if rows and self.log.header else pd.DataFrame()
+            self.pending_version += 1  # 先換 frame 再加版本：讀到新版本時一定拿得到新 frame
+            self.summary.set_pending(self.pending_df)
+
+    def index(self):
+        # 依日期分區的唯讀快照 (含待上傳列)，資料變動後才重建；各 session 共用 (見 log_index.py)
+        with self._index_lock:
+            key = (self.log.version, self.pending_version, self.shards.version if self.shards is not None else 0)
+            if self._index_key != key:
+                self._index, self._index_key = LogIndex(self.frames()[1], version=key), key
+            return self._index
+
+    def frames(self):
+        parts = [self._archive_frame(), self.log.df, self.pending_df]
+        parts = [p for p in parts if not p.empty]
+        return self.items_df, (concat_log(parts) if len(parts) > 1 else parts[0] if parts else self.log.df)
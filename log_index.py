@@ -0,0 +1,69 @@
+# 依日期分區的 log 快照
+# 依 D (schema.py 解析的日期) 穩定排序一次，同一天的列連續存放且保留原本順序；
+# 取某天 / 某段期間是 searchsorted 後切片，取某餐走 (日期, 餐別) 次索引，不必整份布林掃描。
+# 快照建好後不再變動 (欄位陣列設為唯讀)，整個 process 的 session 共用同一份，拿到的切片都是 view；
+# 需要改動請自行 .copy()。由快照算出的衍生結果用 derive() 依版本共用。
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DERIVED_MAX = 64  # 每個快照最多保留幾份衍生結果
+
+def _frozen(df):
+    # 欄位底層陣列設為唯讀：誤改共用資料會直接報錯
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = s.cat.codes.to_numpy(); codes.setflags(write=False)
+            cols[c] = pd.Categorical.from_codes(codes, dtype=s.dtype)
+        elif isinstance(s.dtype, np.dtype):
+            a = s.to_numpy(); a.setflags(write=False); cols[c] = a
+        else: cols[c] = s.array
+    return pd.DataFrame(cols, copy=False)
+
+class LogIndex:
+    def __init__(self, df, version=None):
+        self.version = version
+        self._derived, self._lock = OrderedDict(), threading.Lock()
+        if df.empty or 'D' not in df.columns:
+            self.df, self.days, self.meal_pos = df, np.array([], dtype='datetime64[ns]'), {}
+            return
+        order = np.argsort(df['D'].to_numpy(), kind='stable')  # NaT 排在最後
+        self.df = _frozen(df.iloc[order].reset_index(drop=True))
+        self.days = self.df['D'].to_numpy()
+        self.meal_pos = self.df.groupby([self.df['D'], self.df['Meal_Name'].astype(str)], sort=False).indices
+
+    @staticmethod
+    def _day(d):
+        return np.datetime64(pd.Timestamp(d).normalize().to_datetime64(), 'ns')
+
+    def _bounds(self, d0, d1):
+        return (int(np.searchsorted(self.days, self._day(d0), 'left')),
+                int(np.searchsorted(self.days, self._day(d1), 'right')))
+
+    def day(self, d):
+        s, e = self._bounds(d, d)
+        return self.df.iloc[s:e]
+
+    def range(self, d0, d1):
+        s, e = self._bounds(d0, d1)
+        return self.df.iloc[s:e]
+
+    def meal(self, d, meal):
+        pos = self.meal_pos.get((pd.Timestamp(d).normalize(), str(meal)))
+        return self.df.iloc[pos] if pos is not None else self.df.iloc[0:0]
+
+    def derive(self, key, fn):
+        # fn(快照) 的結果依 key 快取在快照上；快照不可變，同版本各 session 共用同一份
+        with self._lock:
+            if key in self._derived:
+                self._derived.move_to_end(key); return self._derived[key]
+        val = fn(self)
+        with self._lock:
+            self._derived[key] = val
+            while len(self._derived) > DERIVED_MAX: self._derived.popitem(last=False)
+        return val
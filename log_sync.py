@@ -0,0 +1,249 @@
+# Log_Data 增量同步
+# 本地保留一份 log，以「已同步列數 + 最後一列 UUID」當水位線，
+# 每次只抓水位線之後新增的列；偵測到表單被改動 (刪列、插列) 才整張重抓。
+# 有傳入 store (local_store.LocalStore) 時，啟動先從本機快照接續水位線，同步結果也寫回快照。
+# listeners (例如 summary_store.SummaryStore) 會收到變動通知：
+#   reset(df) 整份重來、append(df, new, day_rows) 新增列、touch(df, rows, day_rows) 這些列所屬的日/餐需重算；
+#   day_rows(dates) 以日期索引取出這幾天的列，不必掃整份 log。
+# 完食紀錄以 (Date, Meal_Name) 為鍵做 upsert：用本地的列位置索引找到舊紀錄，確認沒被移動後原地覆寫。
+# 原地覆寫不改變列數與最後一列，水位線看不出來；因此覆寫後在 Log_Meta 工作表寫入新的修訂標記，
+# 增量同步先讀標記，與上次不同 (別的裝置改過某列) 就整張重抓。
+
+import threading
+import time
+
+import pandas as pd
+from gspread.utils import numericise_all, rowcol_to_a1
+
+from schema import FINISH_IDS, apply_log_schema, concat_log
+
+FULL_RESYNC_SEC = 600  # 保險：就算沒偵測到改動，也定期整張重抓一次
+FINISH_NAME = "完食紀錄"
+REV_SHEET = "Log_Meta"
+REV_HEADER = ["Revision", "Updated_At"]
+FULL_AT = "_Full_At"  # 本機快照另存上次整張重抓的時間 (epoch 秒)，重啟後定期重抓的計時接續下去
+
+class ConflictError(Exception):
+    pass
+
+def runs(pos):
+    # 排序後的位置 -> 連續區段 [(起, 訖)]
+    out = []
+    for p in pos:
+        if out and p == out[-1][1] + 1: out[-1][1] = p
+        else: out.append([p, p])
+    return out
+
+def rows_to_frame(header, rows):
+    # 與 get_all_records() 相同的轉換：補齊欄位、數字字串轉數字
+    n = len(header)
+    vals = [numericise_all((r + [""] * (n - len(r)))[:n]) for r in rows]
+    return pd.DataFrame(vals, columns=header)
+
+class LogSync:
+    # meta：修訂標記工作表 (REV_SHEET)，None 表示不檢查
+    def __init__(self, ws, full_resync_sec=FULL_RESYNC_SEC, store=None, name="Log_Data", meta=None):
+        self.ws, self.meta = ws, meta
+        self.rev = None  # 上次同步時的修訂標記；None = 未知
+        self.full_resync_sec = full_resync_sec
+        self.store, self.name = store, name
+        self.lock = threading.RLock()
+        self.header, self.rows, self.n_rows, self.last_uuid = [], [], 0, None
+        self.finish_index = {}  # (Date, Meal_Name) -> 完食紀錄在 rows 中的位置
+        self.date_index = {}    # Date -> 該日各列在 rows 中的位置
+        self.df = pd.DataFrame()
+        self.dirty, self.last_full = True, 0.0
+        self.stats = {'full': 0, 'incr': 0, 'rows_fetched': 0}
+        self.version = 0  # 本地副本每次變動 +1
+        self.listeners = []
+        if store is not None:
+            header, rows = store.load(name)
+            if header:
+                # 快照當作上次同步的結果，下一次同步走增量 (UUID 對不上自然會整張重抓)；
+                # 上次整張重抓已超過 full_resync_sec (或不知道是何時) 就照常整張重抓
+                self._set_rows(header, rows)
+                _, at = store.load(name + FULL_AT)
+                age = max(time.time() - float(at[0][0]), 0.0) if at and at[0] else float("inf")
+                self.dirty, self.last_full = False, time.monotonic() - age
+                _, rev = store.load(REV_SHEET)
+                self.rev = rev[0][0] if rev and rev[0] else None
+
+    def _set_rows(self, header, rows):
+        self.header, self.rows = header, rows
+        self.df = self.frame(rows) if header else pd.DataFrame()
+        self.n_rows, self.last_uuid = len(rows), (rows[-1][0] if rows and rows[-1] else None)
+        self.finish_index, self.date_index = {}, {}
+        self._index_rows(rows, 0)
+
+    def frame(self, rows):
+        # 原始列 -> 套用 Log_Data 型別的 DataFrame (見 schema.py)
+        return apply_log_schema(rows_to_frame(self.header, rows))
+
+    def _index_rows(self, rows, start):
+        if 'Date' not in self.header: return
+        d_i = self.header.index('Date')
+        fin = all(c in self.header for c in ('Meal_Name', 'ItemID', 'Item_Name'))
+        m_i, it_i, n_i = (self.header.index(c) for c in ('Meal_Name', 'ItemID', 'Item_Name')) if fin else (0, 0, 0)
+        for p, r in enumerate(rows, start):
+            if len(r) <= d_i: continue
+            self.date_index.setdefault(r[d_i], []).append(p)
+            if fin and len(r) > max(m_i, it_i, n_i) and r[it_i] in FINISH_IDS and r[n_i] == FINISH_NAME:
+                self.finish_index.setdefault((r[d_i], r[m_i]), []).append(p)
+
+    def day_rows(self, dates):
+        # 指定日期 (Date 字串) 的所有列，依原本順序
+        with self.lock:
+            pos = sorted(p for d in set(dates) for p in self.date_index.get(d, ()))
+            return self.df.iloc[pos]
+
+    def _last_col(self):
+        return rowcol_to_a1(1, len(self.header)).rstrip("0123456789")
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+            listener.reset(self.df)
+
+    def _emit(self, event, *args):
+        self.version += 1
+        if event != 'reset': args += (self.day_rows,)
+        for l in self.listeners: getattr(l, event)(self.df, *args)
+
+    def known_uuids(self, uuids):
+        # 回傳 uuids 中已在本地副本的部分
+        with self.lock:
+            if self.df.empty: return set()
+            col = self.df[self.header[0]].astype(str)
+            return set(col[col.isin(list(uuids))])
+
+    def invalidate(self):
+        # 自己刪列 (例如 save_finish_callback) 之後呼叫，下次同步整張重抓
+        with self.lock: self.dirty = True
+
+    def sync(self):
+        with self.lock:
+            if self.dirty or not self.header or time.monotonic() - self.last_full > self.full_resync_sec: self._full()
+            elif not self._incremental(): self._full()
+            return self.df
+
+    def _read_rev(self):
+        v = self.meta.get("A2:B2")
+        return str(v[0][0]) if v and v[0] else ""
+
+    def _save_rev(self, rev):
+        self.rev = rev
+        if self.store is not None: self.store.save(REV_SHEET, REV_HEADER, [[rev]])
+
+    def _full(self):
+        rev = self._read_rev() if self.meta is not None else None  # 先讀標記：讀表期間的覆寫下次仍會被發現
+        values = self.ws.get_all_values()
+        rows = values[1:] if values else []
+        self._set_rows([c.strip() for c in values[0]] if values else [], rows)
+        self.dirty, self.last_full = False, time.monotonic()
+        if self.store is not None:
+            self.store.save(self.name, self.header, rows)
+            self.store.save(self.name + FULL_AT, ["Full_At"], [[time.time()]])
+        if rev is not None: self._save_rev(rev)
+        self._emit('reset')
+        self.stats['full'] += 1; self.stats['rows_fetched'] += len(rows)
+
+    def _incremental(self):
+        # 從水位線那一列開始抓：第一列必須仍是上次最後一筆 (UUID 相同)，否則表示表單被改過；
+        # 修訂標記變了表示有列被原地覆寫
+        if self.meta is not None and self._read_rev() != self.rev: return False
+        start = self.n_rows + 1  # 工作表列號 (第 1 列為標題)
+        fetched = [list(r) for r in self.ws.get(f"A{start}:{self._last_col()}")]
+        if self.n_rows == 0:
+            if fetched and fetched[0] and [c.strip() for c in fetched[0]] == self.header: fetched = fetched[1:]
+            elif fetched: return False
+        else:
+            if not fetched or not fetched[0] or fetched[0][0] != self.last_uuid: return False
+            fetched = fetched[1:]
+        self.stats['incr'] += 1; self.stats['rows_fetched'] += len(fetched)
+        if not fetched: return True
+        self._append(fetched)
+        return True
+
+    def _append(self, rows, notify=True):
+        new_df = self.frame(rows)
+        self.df = concat_log([self.df, new_df]) if not self.df.empty else new_df
+        self._index_rows(rows, len(self.rows))
+        self.rows.extend(rows)
+        self.n_rows, self.last_uuid = self.n_rows + len(rows), rows[-1][0]
+        if self.store is not None and notify: self.store.append(self.name, rows)
+        if notify: self._emit('append', new_df)
+
+    def apply_local(self, appended, deleted_uuids=()):
+        # 寫入成功後直接套用到本地副本 (write-through)，不必等下一次同步
+        # 若期間有其他裝置寫入，下一次增量同步的 UUID 檢查會對不上而整張重抓
+        with self.lock:
+            if not self.header: self.dirty = True; return
+            appended = [[str(c) for c in r] for r in appended]
+            if deleted_uuids:
+                dead = set(deleted_uuids)
+                gone = [r for r in self.rows if r and r[0] in dead]
+                self.rows = [r for r in self.rows if not (r and r[0] in dead)]
+                self.finish_index, self.date_index = {}, {}; self._index_rows(self.rows, 0)
+                self.df = self.df[~self.df[self.header[0]].astype(str).isin(dead)].reset_index(drop=True)
+                self.n_rows, self.last_uuid = len(self.rows), (self.rows[-1][0] if self.rows else None)
+                if appended: self._append(appended, notify=False)
+                if self.store is not None: self.store.save(self.name, self.header, self.rows)
+                self._emit('touch', self.frame(gone + appended))
+            elif appended: self._append(appended)
+
+    def replace_local(self, pos, row):
+        # 原地覆寫成功後更新本地副本 (列位置不變)
+        with self.lock:
+            row = [str(c) for c in row]
+            old, self.rows[pos] = self.rows[pos], row
+            self.df = concat_log([self.df.iloc[:pos], self.frame([row]), self.df.iloc[pos + 1:]])
+            if pos == self.n_rows - 1: self.last_uuid = row[0]
+            if self.store is not None: self.store.replace(self.name, pos, row)
+            self._emit('touch', self.frame([old, row]))
+
+    def upsert_finish(self, row):
+        # 以 (Date, Meal_Name) 為鍵寫入完食/剩食紀錄：
+        # 有舊紀錄 -> 讀該列確認 UUID 沒變 (沒被其他裝置移動) 後原地覆寫，一讀一寫；
+        # 沒有舊紀錄 -> 直接附加；位置對不上 -> 整張重抓重建索引再試一次。
+        with self.lock:
+            if not self.header: self.sync()
+            key = (str(row[self.header.index('Date')]), str(row[self.header.index('Meal_Name')]))
+            for attempt in range(2):
+                pos = self.finish_index.get(key, [])
+                if not pos:
+                    self.ws.append_row(row); self.apply_local([row])
+                    return 'append'
+                target, last_col = pos[-1], self._last_col()
+                cur = self.ws.get(f"A{target + 2}:{last_col}{target + 2}")
+                if cur and cur[0] and cur[0][0] == self.rows[target][0]:
+                    self.ws.update(range_name=f"A{target + 2}:{last_col}{target + 2}", values=[row])
+                    self.replace_local(target, row)
+                    try:
+                        if len(pos) > 1: self.delete_at(pos[:-1])  # 舊版留下的重複紀錄
+                    finally: self.bump_rev(str(row[0]))
+                    return 'update'
+                self.invalidate(); self.sync()
+            raise ConflictError(f"完食紀錄位置持續變動：{key}")
+
+    def delete_at(self, pos):
+        # 刪除本地副本這些位置的列：連續的合成一段、由下往上刪避免列號位移 (工作表列號 = 位置 + 2)；
+        # 每段先讀回 UUID 核對，對不上 (其他裝置改過表單) 就中止並丟 ConflictError。回傳已刪的 UUID
+        with self.lock:
+            gone = []
+            try:
+                for s, e in reversed(runs(sorted(pos))):
+                    want = [self.rows[i][0] for i in range(s, e + 1)]
+                    got = [r[0] if r else "" for r in self.ws.get(f"A{s + 2}:A{e + 2}")]
+                    if got != want: raise ConflictError(f"Log_Data 第 {s + 2}-{e + 2} 列已變動，刪列中止")
+                    self.ws.delete_rows(s + 2, e + 2)
+                    gone += want
+            except Exception:
+                self.invalidate(); raise  # 可能已刪掉一部分：下次同步整張重抓
+            if gone: self.apply_local([], gone)
+            return gone
+
+    def bump_rev(self, token):
+        # 通知其他裝置：有列被原地改過 (token 每次不同，例如新列的 UUID)；自己已套用，不必重抓
+        if self.meta is None: return
+        self.meta.update(range_name="A2:B2", values=[[token, time.strftime("%Y/%m/%d %H:%M:%S")]])
+        self._save_rev(token)
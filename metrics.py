@@ -0,0 +1,101 @@
+# 效能量測
+# 每次 rerun 記一筆：各段落耗時與列數、這次 rerun 在前景發出的 Sheets 呼叫次數與耗時；
+# 背景執行緒 (快照對帳、日誌上傳) 的呼叫另外累計。另保留最近 60 秒的讀寫次數，對照 Sheets 每分鐘配額。
+# 設 DAWEN_METRICS_LOG 時每筆紀錄附加寫入該 JSON lines 檔，供離線分析。
+
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+READ_CALLS = {'get_all_values', 'get_all_records', 'get', 'batch_get', 'row_values', 'col_values', 'acell', 'cell'}
+WRITE_CALLS = {'append_row', 'append_rows', 'update', 'batch_update', 'update_cell', 'delete_rows', 'insert_row', 'insert_rows', 'clear'}
+QUOTA_PER_MIN = {'read': 60, 'write': 60}  # Google Sheets API 每位使用者每分鐘預設配額
+METRICS_LOG = os.environ.get("DAWEN_METRICS_LOG", "")
+KEEP_RUNS = 200
+
+class Metrics:
+    def __init__(self, log_path=METRICS_LOG, keep=KEEP_RUNS):
+        self.lock = threading.Lock()
+        self.local = threading.local()  # 目前執行緒 (即該次 rerun) 進行中的紀錄
+        self.log_path = log_path
+        self.runs = deque(maxlen=keep)
+        self.window = deque()  # 最近 60 秒的 (時間, read/write)
+        self.background = Counter()
+
+    def _current(self):
+        return getattr(self.local, 'run', None)
+
+    def _open(self, auto=False):
+        self.local.run = {'ts': time.time(), 'spans': [], 'api': Counter(), 'api_ms': 0.0, '_t0': time.perf_counter(), '_auto': auto}
+
+    def start_run(self):
+        # 按鈕 callback 在 script 之前執行，期間量到的段落併入這次 rerun；
+        # 上一次被 st.rerun / st.stop 中斷而沒收尾的紀錄在這裡結束
+        run = self._current()
+        if run is not None and run['_auto']: run['_auto'] = False; return
+        self.end_run(); self._open()
+
+    def end_run(self):
+        run = self._current()
+        if run is None: return None
+        self.local.run = None
+        run['total_ms'] = round((time.perf_counter() - run.pop('_t0')) * 1000, 2)
+        run.pop('_auto')
+        run['api'], run['api_ms'] = dict(run['api']), round(run['api_ms'], 2)
+        with self.lock:
+            self.runs.append(run)
+            if self.log_path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f: f.write(json.dumps(run, ensure_ascii=False, default=str) + "\n")
+        return run
+
+    @contextmanager
+    def span(self, name, rows=None):
+        # 回傳的 dict 可在區塊內補上 rows 等欄位
+        if self._current() is None: self._open(auto=True)
+        run, rec, t0 = self._current(), {'name': name, 'rows': rows}, time.perf_counter()
+        try: yield rec
+        finally:
+            rec['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+            run['spans'].append(rec)
+
+    def api(self, kind, method, ms):
+        now = time.time()
+        with self.lock:
+            self.window.append((now, kind))
+            while self.window and self.window[0][0] < now - 60: self.window.popleft()
+            run = self._current()
+            if run is None: self.background[f"{kind}:{method}"] += 1; return
+        run['api'][f"{kind}:{method}"] += 1; run['api_ms'] += ms
+
+    def quota(self):
+        # 最近 60 秒 (含背景) 的讀寫次數
+        now = time.time()
+        with self.lock:
+            used = Counter(k for t, k in self.window if t >= now - 60)
+        return {k: (used[k], limit) for k, limit in QUOTA_PER_MIN.items()}
+
+    def jsonl(self):
+        with self.lock:
+            return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in self.runs)
+
+    def instrument(self, ws):
+        return InstrumentedWorksheet(ws, self)
+
+class InstrumentedWorksheet:
+    # 包住 gspread 工作表 (或 storage.py 的替代後端)，讀寫呼叫都記到 Metrics；其餘屬性原樣轉交
+    def __init__(self, ws, metrics):
+        self._ws, self._metrics = ws, metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._ws, name)
+        kind = 'read' if name in READ_CALLS else 'write' if name in WRITE_CALLS else None
+        if kind is None or not callable(attr): return attr
+        def call(*args, **kwargs):
+            t0 = time.perf_counter()
+            try: return attr(*args, **kwargs)
+            finally: self._metrics.api(kind, name, (time.perf_counter() - t0) * 1000)  # 失敗的呼叫一樣吃配額
+        return call
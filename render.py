@@ -0,0 +1,49 @@
+# HTML 區塊產生器 (純函式，不依賴 streamlit，可單獨做基準測試)
+
+def render_header(date_str):
+    cat_svg = '<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M12 5c.67 0 1.35.09 2 .26 1.78-2 5.03-2.84 6.42-2.26 1.4.58-.42 7-.42 7 .57 1.07 1 2.24 1 3.44C21 17.9 16.97 21 12 21S3 17.9 3 13.44C3 12.24 3.43 11.07 4 10c0 0-1.82-6.42-.42-7 1.39-.58 4.64.26 6.42 2.26.65-.17 1.33-.26 2-.26z"/></svg>'
+    return f'<div class="main-header"><div class="header-icon">{cat_svg}</div><div><div style="font-size:24px; font-weight:800; color:#012172;">大文的飲食日記</div><div style="font-size:15px; font-weight:500; color:#5A6B8C;">{date_str}</div></div></div>'
+
+def render_daily_stats_html(day_stats):
+    def get_stat_html(label, value, unit, color_class):
+        return f'<div class="stat-item"><div class="stat-header {color_class}">{label}</div><div style="display:flex; align-items:baseline;"><span class="stat-value">{value}</span><span class="stat-unit">{unit}</span></div></div>'
+    html = '<div class="grid-row-3">' + get_stat_html("熱量", int(day_stats['cal']), "kcal", "bg-orange") + get_stat_html("食物", f"{day_stats['food']:.1f}", "g", "bg-blue") + get_stat_html("飲水", f"{day_stats['water']:.1f}", "ml", "bg-cyan") + '</div>'
+    html += '<div class="grid-row-2">' + get_stat_html("蛋白質", f"{day_stats['prot']:.1f}", "g", "bg-red") + get_stat_html("脂肪", f"{day_stats['fat']:.1f}", "g", "bg-yellow") + '</div>'
+    return html
+
+def render_supp_med_html(supp_list, med_list):
+    def get_tag_html(items, type_class):
+        if not items: return '<span style="color:#5A6B8C; font-size:13px;">無</span>'
+        return "".join([f'<span class="tag {type_class}">{item["name"]}<span class="tag-count">x{int(item["count"])}</span></span>' for item in items])
+    html = '<div style="display:grid; grid-template-columns: 1fr 1fr; gap:20px; margin-top:10px;">'
+    html += f'<div><div style="font-size:12px;font-weight:700;color:#047857;margin-bottom:4px;">保養品</div><div class="tag-container">{get_tag_html(supp_list, "tag-green")}</div></div>'
+    html += f'<div style="border-left:1px solid #f1f5f9;padding-left:20px;"><div><div style="font-size:12px;font-weight:700;color:#be123c;margin-bottom:4px;">藥品</div><div class="tag-container">{get_tag_html(med_list, "tag-red")}</div></div></div></div>'
+    return html
+
+def render_meal_stats_simple(meal_stats):
+    html = '<div class="simple-grid">'
+    for l, v, u in [("熱量", int(meal_stats['cal']), "kcal"), ("食物", f"{meal_stats['food']:.1f}", "g"), ("飲水", f"{meal_stats['water']:.1f}", "ml"), ("蛋白", f"{meal_stats['prot']:.1f}", "g"), ("脂肪", f"{meal_stats['fat']:.1f}", "g")]:
+        html += f'<div class="simple-item"><div style="font-size:11px; color:#5A6B8C;">{l}</div><div style="font-size:16px; font-weight:800;">{v}<span style="font-size:10px;">{u}</span></div></div>'
+    return html + '</div>'
+
+def render_rolling_html(rolling, weight_kg=None):
+    # rolling：RollingStats.summary() 的結果 {視窗天數: {...}}
+    wins = sorted(rolling)
+    fmt = lambda v, d=1: f"{v:.{d}f}"
+    rows = [("熱量", "kcal", 'cal', 0), ("蛋白質", "g", 'prot', 1), ("脂肪", "g", 'fat', 1), ("磷", "mg", 'phos_mg', 0), ("飲水", "ml", 'water', 0)]
+    th = 'style="padding:6px 8px; font-size:12px; color:#5A6B8C; text-align:right;"'
+    td = 'style="padding:6px 8px; font-size:14px; font-weight:700; text-align:right;"'
+    html = '<table style="width:100%; border-collapse:collapse;"><tr><th style="text-align:left; padding:6px 8px; font-size:12px; color:#5A6B8C;">日平均</th>'
+    html += "".join(f'<th {th}>近 {n} 天<br><span style="font-weight:400;">({rolling[n]["days"]} 天有紀錄)</span></th>' for n in wins)
+    if weight_kg: html += "".join(f'<th {th}>每公斤 ({n} 天)</th>' for n in wins)
+    html += '</tr>'
+    for label, unit, key, dec in rows:
+        html += f'<tr style="border-top:1px solid #f1f5f9;"><td style="padding:6px 8px; font-size:13px; font-weight:700;">{label} <span style="font-size:11px; color:#5A6B8C;">{unit}</span></td>'
+        html += "".join(f'<td {td}>{fmt(rolling[n][key], dec)}</td>' for n in wins)
+        if weight_kg: html += "".join(f'<td {td}>{fmt(rolling[n][key + "_per_kg"], 1 if dec == 0 else 2)}</td>' for n in wins)
+        html += '</tr>'
+    html += f'<tr style="border-top:1px solid #f1f5f9;"><td style="padding:6px 8px; font-size:13px; font-weight:700;">磷 / 100 kcal <span style="font-size:11px; color:#5A6B8C;">mg</span></td>'
+    html += "".join(f'<td {td}>{fmt(rolling[n]["phos_per_100kcal"])}</td>' for n in wins) + ('<td></td>' * len(wins) if weight_kg else '') + '</tr>'
+    html += '</table>'
+    if not weight_kg: html += '<div style="font-size:12px; color:#5A6B8C; margin-top:6px;">在左側設定體重後顯示每公斤數值</div>'
+    return html
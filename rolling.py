@@ -0,0 +1,48 @@
+# 滾動視窗營養分析 (近 7 / 30 天)
+# 掛在 SummaryStore 上：新增列、完食/剩食更正、待上傳列或封存分片載入時，只收到變動那幾天的日合計，
+# 每天的更新是固定成本；視窗查詢只讀固定天數的日合計，與 log 長度無關。
+# 平均值以「有紀錄的天數」為分母 (沒記錄的日子不當成沒吃)，另提供每公斤體重與每 100 kcal 磷含量。
+
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+from rollup import STAT_KEYS
+
+WINDOWS = (7, 30)
+
+class RollingStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.daily = {}  # date -> np.ndarray (STAT_KEYS)
+        self.version = 0
+
+    def days_changed(self, g, full=False, touched=None):
+        vecs = dict(zip(g.index, g[STAT_KEYS].to_numpy(dtype=float)))
+        with self.lock:
+            if full: self.daily = vecs
+            else:
+                for d in touched or (): self.daily.pop(d, None)
+                self.daily.update(vecs)
+            self.version += 1
+
+    def window(self, end, days):
+        # 截至 end (含) 的 days 天：回傳 {'days': 有紀錄天數, 'sum': {...}, 'avg': {...}}
+        with self.lock:
+            vecs = [self.daily[d] for d in (end - timedelta(days=i) for i in range(days)) if d in self.daily]
+        total = np.sum(vecs, axis=0) if vecs else np.zeros(len(STAT_KEYS))
+        avg = total / len(vecs) if vecs else total
+        return {'days': len(vecs), 'sum': dict(zip(STAT_KEYS, total)), 'avg': dict(zip(STAT_KEYS, avg))}
+
+    def summary(self, end, weight_kg=None, windows=WINDOWS):
+        # 各視窗的日平均；有體重時附每公斤數值。磷存為 g，另換算 mg 與 mg/100 kcal
+        out = {}
+        for n in windows:
+            w = self.window(end, n)
+            a = w['avg']
+            row = {'days': w['days'], 'cal': a['cal'], 'prot': a['prot'], 'fat': a['fat'], 'phos_mg': a['phos'] * 1000, 'water': a['water'], 'food': a['food']}
+            row['phos_per_100kcal'] = row['phos_mg'] / a['cal'] * 100 if a['cal'] > 0 else 0.0
+            if weight_kg: row.update({f"{k}_per_kg": row[k] / weight_kg for k in ('cal', 'prot', 'fat', 'phos_mg', 'water')})
+            out[n] = row
+        return out
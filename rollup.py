@@ -0,0 +1,83 @@
+# 營養彙總引擎
+# 一次 groupby 算出任意分組 (日、餐、日+餐) 的熱量/食物/飲水/蛋白質/脂肪/磷，
+# 規則與逐組版本相同：同一餐的完食/剩食紀錄只留最後一筆，剩食依當組食物/飲水比例分攤。
+
+import numpy as np
+import pandas as pd
+
+from schema import FINISH_IDS
+
+EXCLUDE_CATS = ['藥品', '保養品']
+WATER_CATS = ['水', '飲用水']
+NUTRIENT_COLS = {'cal': 'Cal_Sub', 'prot': 'Prot_Sub', 'fat': 'Fat_Sub', 'phos': 'Phos_Sub'}
+STAT_KEYS = ['cal', 'food', 'water', 'prot', 'fat', 'phos']
+
+# --- 逐組參考實作 (舊版邏輯，保留供比對與基準測試) ---
+def clean_duplicate_finish_records(df):
+    if df.empty: return df
+    mask_finish = df['ItemID'].isin(FINISH_IDS)
+    df_others = df[~mask_finish]
+    df_finish = df[mask_finish]
+    if df_finish.empty: return df
+    df_finish_clean = df_finish.drop_duplicates(subset=['Meal_Name'], keep='last')
+    return pd.concat([df_others, df_finish_clean], ignore_index=True)
+
+def calculate_intake_breakdown(df):
+    if df.empty: return 0.0, 0.0
+    if 'Category' in df.columns: df['Category'] = df['Category'].astype(str).str.strip()
+    df_calc = df[~df['Category'].isin(EXCLUDE_CATS)].copy()
+    if df_calc.empty: return 0.0, 0.0
+    df_input = df_calc[df_calc['Net_Quantity'] > 0]
+    df_waste = df_calc[df_calc['Net_Quantity'] < 0]
+    input_water = df_input[df_input['Category'].isin(WATER_CATS)]['Net_Quantity'].sum()
+    input_food = df_input[~df_input['Category'].isin(WATER_CATS)]['Net_Quantity'].sum()
+    total_input = input_water + input_food
+    total_waste = df_waste['Net_Quantity'].sum()
+    ratio_water = input_water / total_input if total_input > 0 else 0.0
+    ratio_food = input_food / total_input if total_input > 0 else 1.0
+    return input_food + (total_waste * ratio_food), input_water + (total_waste * ratio_water)
+
+# --- 向量化版本 ---
+def finish_keep_mask(df, keys):
+    # 每個 keys 組合 (需含 Meal_Name) 的完食/剩食紀錄只保留最後一筆；一般品項全保留
+    is_fin = df['Is_Finish'].to_numpy() if 'Is_Finish' in df.columns else df['ItemID'].isin(FINISH_IDS).to_numpy()
+    keep = np.ones(len(df), dtype=bool)
+    if is_fin.any():
+        pos = np.flatnonzero(is_fin)
+        keep[pos[df.iloc[pos][keys].duplicated(keep='last').to_numpy()]] = False
+    return keep
+
+def intake_parts(df):
+    # 每列拆成：營養素、食物/飲水投入量、剩食量 (負值)；藥品與保養品不計入重量
+    num = lambda c: pd.to_numeric(df[c], errors='coerce').fillna(0.0).to_numpy(dtype=float) if c in df.columns else np.zeros(len(df))
+    cat = df['Category'] if isinstance(df['Category'].dtype, pd.CategoricalDtype) else df['Category'].astype(str).str.strip()  # schema.py 已去空白
+    net = num('Net_Quantity')
+    calc = ~cat.isin(EXCLUDE_CATS).to_numpy()
+    water = cat.isin(WATER_CATS).to_numpy()
+    parts = {k: num(c) for k, c in NUTRIENT_COLS.items()}
+    parts['in_food'] = np.where(calc & (net > 0) & ~water, net, 0.0)
+    parts['in_water'] = np.where(calc & (net > 0) & water, net, 0.0)
+    parts['waste'] = np.where(calc & (net < 0), net, 0.0)
+    return pd.DataFrame(parts, index=df.index)
+
+def finalize(g):
+    # 由分組加總算出食物/飲水：剩食依投入比例分攤，沒有投入時全數算在食物
+    total = g['in_food'] + g['in_water']
+    has = total > 0
+    r_food = np.where(has, g['in_food'] / total.where(has, 1.0), 1.0)
+    r_water = np.where(has, g['in_water'] / total.where(has, 1.0), 0.0)
+    return pd.DataFrame({'cal': g['cal'], 'food': g['in_food'] + g['waste'] * r_food, 'water': g['in_water'] + g['waste'] * r_water,
+                         'prot': g['prot'], 'fat': g['fat'], 'phos': g['phos']}, index=g.index)
+
+def rollup(df, by='Date'):
+    by = [by] if isinstance(by, str) else list(by)
+    if df.empty: return pd.DataFrame(columns=STAT_KEYS, index=pd.MultiIndex.from_tuples([], names=by) if len(by) > 1 else pd.Index([], name=by[0]))
+    d = df.iloc[finish_keep_mask(df, by if 'Meal_Name' in by else by + ['Meal_Name'])]
+    parts = intake_parts(d)
+    for k in by: parts[k] = d[k]
+    return finalize(parts.groupby(by, sort=True, observed=True).sum())
+
+def summarize(df):
+    # 整個 df 視為一組 (例如當日或單餐)，回傳 dict
+    if df.empty: return {k: 0.0 for k in STAT_KEYS}
+    return rollup(df.assign(_all=0), '_all').iloc[0].to_dict()
@@ -0,0 +1,42 @@
+# Log_Data 欄位型別
+# 載入時套用一次：數值欄轉成 float、日期解析成 D (datetime64)、重複性高的文字欄用 category，
+# 另外預先算好 Is_Finish (完食/剩食紀錄)。之後每次 rerun 不必再 to_numeric / to_datetime。
+
+import pandas as pd
+
+FINISH_IDS = ['WASTE', 'FINISH']
+LOG_NUMERIC = ['Scale_Reading', 'Bowl_Weight', 'Net_Quantity', 'Cal_Sub', 'Prot_Sub', 'Fat_Sub', 'Phos_Sub']
+# 只用來加總顯示的欄位才降成 float32；秤重、碗重、淨重、熱量會被讀回來算新列 (前筆參考、剩食熱量) 再寫入表單，
+# 必須保留 float64，否則 80.1 會變成 80.09999847 之類的值寫回去
+LOG_FLOAT32 = ['Prot_Sub', 'Fat_Sub', 'Phos_Sub']
+LOG_CATEGORICAL = ['Date', 'Meal_Name', 'ItemID', 'Category', 'Item_Name', 'Note', 'Finish_Time']
+DERIVED_COLS = ['D', 'Is_Finish']  # 不在工作表上的衍生欄
+
+def parse_dates(s):
+    # 只解析不重複的日期字串，再依 category 代碼展開
+    s = s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype(str).astype('category')
+    parsed = pd.DatetimeIndex([pd.to_datetime(c, errors='coerce') for c in s.cat.categories], dtype='datetime64[ns]').normalize()
+    return pd.Series(parsed.take(s.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT), index=s.index)
+
+def apply_log_schema(df):
+    # df 為剛由原始列建立的新 frame，直接就地轉型
+    for c in LOG_NUMERIC:
+        if c in df.columns: df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0).astype('float32' if c in LOG_FLOAT32 else 'float64')
+    if 'Category' in df.columns: df['Category'] = df['Category'].astype(str).str.strip()
+    for c in LOG_CATEGORICAL:
+        if c in df.columns: df[c] = df[c].astype(str).astype('category')
+    if 'Date' in df.columns: df['D'] = parse_dates(df['Date'])
+    if 'ItemID' in df.columns: df['Is_Finish'] = df['ItemID'].isin(FINISH_IDS).to_numpy()
+    return df
+
+def concat_log(frames):
+    # 合併前先對齊 category，避免 concat 後退化成 object
+    frames = [f for f in frames if len(f.columns)]
+    if len(frames) <= 1: return frames[0] if frames else pd.DataFrame()
+    frames = [f.copy(deep=False) for f in frames]
+    for c in LOG_CATEGORICAL:
+        if not all(c in f.columns and isinstance(f[c].dtype, pd.CategoricalDtype) for f in frames): continue
+        cats = frames[0][c].cat.categories
+        for f in frames[1:]: cats = cats.append(f[c].cat.categories.difference(cats))
+        for f in frames: f[c] = f[c].cat.set_categories(cats)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,165 @@
+# Log_Data 分片封存
+# 已結束的期間 (預設每年一張，DAWEN_SHARD_PERIOD=M 改每月) 從 Log_Data 搬到 Log_Data_<期間> 工作表，
+# 並記在 Log_Manifest (分片、期間、起訖日期、列數)。Log_Data 只留目前期間 (熱分片)，
+# 當日與近期趨勢只讀它；查到較早的日期時才抓需要的封存分片，多張平行抓取後合併。
+# 封存分片之後不再變動，抓過一次就存在本機快照，列數與 manifest 相同就不再重抓。
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from log_sync import rows_to_frame
+from schema import apply_log_schema, concat_log
+
+SHARD_PERIOD = os.environ.get("DAWEN_SHARD_PERIOD", "Y").upper()
+ARCHIVE_GRACE_DAYS = 31  # 期間結束後多久才封存 (保留補登的時間)
+MANIFEST = "Log_Manifest"
+MANIFEST_HEADER = ["Shard", "Period", "First_Date", "Last_Date", "Rows", "Archived_At"]
+SHARD_PREFIX = "Log_Data_"
+MAX_WORKERS = 4
+APPEND_CHUNK = 5000  # 單次 append_rows 的列數上限，避免請求過大
+UNFORMATTED = dict(value_render_option="UNFORMATTED_VALUE", date_time_render_option="FORMATTED_STRING")
+
+def period_of(d, freq=SHARD_PERIOD):
+    return f"{d.year}" if freq == "Y" else f"{d.year}-{d.month:02d}"
+
+def period_end(period):
+    y, _, m = period.partition("-")
+    if not m: return date(int(y), 12, 31)
+    nxt = date(int(y) + (m == "12"), 1 if m == "12" else int(m) + 1, 1)
+    return nxt - timedelta(days=1)
+
+def _parse_date(s, cache):
+    if s not in cache:
+        try: cache[s] = datetime.strptime(s.strip(), "%Y/%m/%d").date()
+        except ValueError:
+            d = pd.to_datetime(s, errors="coerce")
+            cache[s] = None if pd.isna(d) else d.date()
+    return cache[s]
+
+class ShardSet:
+    # open_shard(title, header=None)：取得工作表；給 header 時不存在就建立，否則回傳 None
+    def __init__(self, open_shard, store, freq=SHARD_PERIOD, grace_days=ARCHIVE_GRACE_DAYS):
+        self.open_shard, self.store, self.freq, self.grace_days = open_shard, store, freq, grace_days
+        self.lock = threading.RLock()
+        self.manifest = {}  # 期間 -> manifest 列 (dict)，順序同工作表
+        self.loaded = {}    # 期間 -> DataFrame (已套用 schema)
+        self.version = 0
+        h, rows = store.load(MANIFEST)
+        if h: self._set_manifest(rows)
+
+    def _set_manifest(self, rows):
+        self.manifest = {r[1]: dict(zip(MANIFEST_HEADER, r)) for r in rows if len(r) >= len(MANIFEST_HEADER) and r[1]}
+
+    def load_manifest(self):
+        ws = self.open_shard(MANIFEST)
+        rows = [list(r) for r in ws.get_all_values()[1:]] if ws is not None else []
+        with self.lock:
+            self.store.save(MANIFEST, MANIFEST_HEADER, rows)
+            self._set_manifest(rows)
+            stale = [p for p in self.loaded if p not in self.manifest or len(self.loaded[p]) != int(self.manifest[p]["Rows"] or 0)]
+            for p in stale: del self.loaded[p]
+            if stale: self.version += 1
+
+    def periods_for(self, d0, d1):
+        d0, d1 = str(d0).replace("-", "/"), str(d1).replace("-", "/")
+        return sorted(p for p, m in self.manifest.items() if m["First_Date"] <= d1 and m["Last_Date"] >= d0)
+
+    def _fetch(self, period):
+        # 本機快照列數與 manifest 相同就直接用，否則讀整張分片
+        title, want = SHARD_PREFIX + period, int(self.manifest[period]["Rows"] or 0)
+        header, rows = self.store.load(title)
+        if not header or len(rows) != want:
+            values = self.open_shard(title).get_all_values()
+            header, rows = [c.strip() for c in values[0]], [list(r) for r in values[1:]]
+            self.store.save(title, header, rows)
+        return period, apply_log_schema(rows_to_frame(header, rows))
+
+    def read(self, period):
+        # 讀一張封存分片但不放進 loaded (匯出用，用完即丟)
+        return self._fetch(period)[1]
+
+    def ensure(self, d0, d1):
+        # 確保涵蓋 [d0, d1] 的封存分片都已載入；有新載入時回傳 True
+        need = [p for p in self.periods_for(d0, d1) if p not in self.loaded]
+        if not need: return False
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(need))) as ex:
+            fetched = list(ex.map(self._fetch, need))
+        with self.lock:
+            for p, df in fetched: self.loaded[p] = df
+            self.version += 1
+        return True
+
+    def frame(self):
+        with self.lock:
+            return concat_log([self.loaded[p] for p in sorted(self.loaded)])
+
+    def closed(self, d, today=None):
+        # d 所在期間已過補登寬限期 (已封存或下次就會封存)
+        return period_end(period_of(d, self.freq)) + timedelta(days=self.grace_days) < (today or date.today())
+
+    def due(self, log, today=None):
+        # Log_Data 裡是否還有已可封存的期間
+        if log.df.empty or "D" not in log.df.columns: return False
+        first = log.df["D"].min()
+        return not pd.isna(first) and self.closed(first.date(), today)
+
+    def _plan(self, log, today):
+        # 由呼叫端持有 log.lock：Log_Data 中已可封存的列，依期間分組
+        i_date, cache, groups = log.header.index("Date"), {}, {}
+        for r in log.rows:
+            d = _parse_date(r[i_date], cache) if len(r) > i_date else None
+            if d is not None and self.closed(d, today): groups.setdefault(period_of(d, self.freq), []).append(r[0])
+        return groups
+
+    def _copy(self, src, header, groups):
+        # 寫入分片 (以 UUID 去重) -> 更新 manifest；Log_Data 只讀。回傳已在分片中的 UUID。
+        # 來源以未格式化的值讀取再 RAW 寫入，數字保持數字 (get_all_values 的格式化字串 RAW 寫入會變成文字)；日期時間維持原本的字串
+        raw = {str(r[0]): list(r) + [""] * (len(header) - len(r)) for r in src.get(**UNFORMATTED)[1:] if r}
+        self.load_manifest()
+        m_ws, i_date, cache, done = self.open_shard(MANIFEST, MANIFEST_HEADER), header.index("Date"), {}, set()
+        for p, move in sorted(groups.items()):
+            title = SHARD_PREFIX + p
+            ws = self.open_shard(title, header)
+            existing = [list(r) for r in ws.get_all_values()[1:]]
+            have = {r[0] for r in existing if r}
+            new = [raw[u] for u in move if u not in have and u in raw]  # 規劃後被其他裝置刪掉的列就不搬
+            for s in range(0, len(new), APPEND_CHUNK): ws.append_rows(new[s:s + APPEND_CHUNK])
+            rows = existing + [[str(c) for c in r] for r in new]
+            done |= {r[0] for r in rows if r}
+            dates = sorted(d for d in (_parse_date(r[i_date], cache) for r in rows if len(r) > i_date) if d is not None)
+            entry = [title, p, dates[0].strftime("%Y/%m/%d"), dates[-1].strftime("%Y/%m/%d"), str(len(rows)), time.strftime("%Y/%m/%d %H:%M:%S")]
+            if p in self.manifest:
+                at = list(self.manifest).index(p) + 2  # manifest 依工作表列序保存
+                m_ws.update(range_name=f"A{at}:F{at}", values=[entry])
+            else: m_ws.append_row(entry)
+            self.store.save(title, header, rows)
+            with self.lock:
+                self.manifest[p] = dict(zip(MANIFEST_HEADER, entry))
+                self.loaded[p] = apply_log_schema(rows_to_frame(header, rows))
+        with self.lock:
+            self.store.save(MANIFEST, MANIFEST_HEADER, [[m[k] for k in MANIFEST_HEADER] for m in self.manifest.values()])
+            self.version += 1
+        return done
+
+    def _delete(self, log, uuids):
+        # 由呼叫端持有 log.lock 並剛整張同步：依最新位置刪除已寫入分片的列 (逐段核對 UUID，見 LogSync.delete_at)；
+        # 其他裝置在同步後又改了表單就中止，下次重跑 (分片已以 UUID 去重)
+        return log.delete_at([i for i, r in enumerate(log.rows) if r and r[0] in uuids])
+
+    def archive(self, log, today=None):
+        # 步驟：寫入分片 (以 UUID 去重) -> 更新 manifest -> 刪除 Log_Data 的列；任何一步失敗都可重跑，不會遺失或重複資料。
+        # 只在規劃與最後同步、刪列時持有 log.lock；寫分片這段網路讀寫期間其他 session 照常同步。回傳搬移列數。
+        today = today or date.today()
+        with log.lock:
+            log.invalidate(); log.sync()
+            header, groups = list(log.header), self._plan(log, today)
+        if not groups: return 0
+        done = self._copy(log.ws, header, groups)
+        with log.lock:
+            log.invalidate(); log.sync()  # 寫分片期間可能有新列或其他裝置的改動：以最新位置刪除
+            return len(self._delete(log, {u for move in groups.values() for u in move} & done))
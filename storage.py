@@ -0,0 +1,218 @@
+# 儲存後端
+# app 只透過 worksheet 介面存取資料：get_all_values / get_all_records / get(range, value_render_option=) /
+# append_row / append_rows / update(range_name=, values=) / delete_rows (與 gspread.Worksheet 相同)。
+# 後端提供 open() -> (Log_Data, DB_Items)，以及 worksheet(title, header=None) 取得其他工作表 (封存分片用，見 shards.py)。
+# 後端：sheets (正式 Google Sheets)、sqlite (本機檔案)、fake (記憶體，模擬延遲與配額，供壓測/離線分析)。
+# 以環境變數 DAWEN_BACKEND 或 secrets 的 storage_backend 選擇，預設 sheets。
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import numericise_all
+
+LOG_HEADER = ["UUID", "Timestamp", "Date", "Time", "Meal_Name", "ItemID", "Category", "Scale_Reading", "Bowl_Weight",
+              "Net_Quantity", "Cal_Sub", "Prot_Sub", "Fat_Sub", "Phos_Sub", "Note", "Item_Name", "Finish_Time"]
+ITEMS_HEADER = ["ItemID", "Item_Name", "Category", "Ref_Cal_100g", "Protein_Pct", "Fat_Pct", "Phos_Pct", "Unit_Type"]
+DEMO_ITEMS = [
+    ["F001", "雞胸肉", "主食", 110, 23, 1.5, 0.22, "g"],
+    ["F002", "鮪魚罐", "主食", 90, 16, 2.5, 0.2, "g"],
+    ["F003", "乾飼料", "乾糧", 380, 34, 16, 1.0, "g"],
+    ["W001", "飲用水", "水", 0, 0, 0, 0, "ml"],
+    ["S001", "魚油", "保養品", 10, 0, 1, 0, "顆"],
+    ["M001", "腸胃藥", "藥品", 0, 0, 0, 0, "顆"],
+]
+
+class QuotaExceededError(Exception):
+    pass
+
+def _a1_rows(range_name, n):
+    # 只支援 app 用到的整列範圍：A5:Q、A5:Q20
+    m = re.match(r"^[A-Z]+(\d+)(?::[A-Z]+(\d*))?$", range_name or "")
+    if not m: return 0, n
+    return int(m.group(1)) - 1, (int(m.group(2)) if m.group(2) else n)
+
+def _records(values):
+    if not values: return []
+    keys = values[0]
+    return [dict(zip(keys, numericise_all([str(c) for c in r] + [""] * (len(keys) - len(r))))) for r in values[1:]]
+
+# --- 記憶體假表 ---
+class FakeQuota:
+    # 模擬 Sheets 每分鐘讀/寫次數上限
+    def __init__(self, read_per_min=60, write_per_min=60, window=60.0):
+        self.limits, self.window = {'read': read_per_min, 'write': write_per_min}, window
+        self.calls = {'read': deque(), 'write': deque()}
+        self.lock = threading.Lock()
+
+    def take(self, kind):
+        with self.lock:
+            if not self.limits[kind]: return
+            now, q = time.monotonic(), self.calls[kind]
+            while q and now - q[0] > self.window: q.popleft()
+            if len(q) >= self.limits[kind]: raise QuotaExceededError(f"429 RESOURCE_EXHAUSTED: {kind} quota ({self.limits[kind]}/min)")
+            q.append(now)
+
+class FakeWorksheet:
+    def __init__(self, title, values, latency=0.0, quota=None):
+        self.title, self.values = title, [list(r) for r in values]
+        self.latency, self.quota = latency, quota
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def _call(self, name, kind):
+        self.stats[name] += 1
+        if self.quota is not None: self.quota.take(kind)
+        if self.latency: time.sleep(self.latency)
+
+    def get_all_values(self):
+        self._call('get_all_values', 'read')
+        with self.lock: return [[str(c) for c in r] for r in self.values]
+
+    def get_all_records(self):
+        return _records(self.get_all_values())
+
+    def get(self, range_name=None, value_render_option=None, **kw):
+        self._call('get', 'read')
+        with self.lock:
+            s, e = _a1_rows(range_name, len(self.values))
+            if value_render_option == "UNFORMATTED_VALUE": return [list(r) for r in self.values[s:e]]
+            return [[str(c) for c in r] for r in self.values[s:e]]
+
+    def append_row(self, row, **kw):
+        self.append_rows([row], _name='append_row')
+
+    def append_rows(self, rows, _name='append_rows', **kw):
+        self._call(_name, 'write')
+        with self.lock: self.values.extend(list(r) for r in rows)
+
+    def update(self, range_name=None, values=None, **kw):
+        self._call('update', 'write')
+        with self.lock:
+            s, _ = _a1_rows(range_name, len(self.values))
+            for i, r in enumerate(values or [], s):
+                if i < len(self.values): self.values[i] = list(r)
+                else: self.values.append(list(r))
+
+    def delete_rows(self, start_index, end_index=None):
+        self._call('delete_rows', 'write')
+        with self.lock: del self.values[start_index - 1:(end_index or start_index)]
+
+class FakeBackend:
+    def __init__(self, log_rows=(), items=DEMO_ITEMS, latency=0.0, read_per_min=60, write_per_min=60):
+        self.quota = FakeQuota(read_per_min, write_per_min)  # 0 = 不限制
+        self.latency = latency
+        self.sheet_log = FakeWorksheet("Log_Data", [LOG_HEADER] + list(log_rows), latency, self.quota)
+        self.sheet_db = FakeWorksheet("DB_Items", [ITEMS_HEADER] + list(items), latency, self.quota)
+        self.sheets = {"Log_Data": self.sheet_log, "DB_Items": self.sheet_db}
+
+    def open(self):
+        return self.sheet_log, self.sheet_db
+
+    def worksheet(self, title, header=None):
+        if title not in self.sheets and header is not None: self.sheets[title] = FakeWorksheet(title, [header], self.latency, self.quota)
+        return self.sheets.get(title)
+
+# --- SQLite ---
+class SQLiteWorksheet:
+    # 每張表一個 table，列順序 = id 順序，第 1 列為標題 (與工作表列號一致)
+    def __init__(self, path, title, header):
+        self.path, self.table = path, self.table_name(title)
+        with self._conn() as c:
+            c.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT)")
+            if c.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] == 0:
+                c.execute(f"INSERT INTO {self.table} (data) VALUES (?)", (json.dumps(header, ensure_ascii=False),))
+
+    @staticmethod
+    def table_name(title):
+        return "ws_" + re.sub(r"\W", "_", title)
+
+    def _conn(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get_all_values(self):
+        with self._conn() as c:
+            return [[str(v) for v in json.loads(d)] for (d,) in c.execute(f"SELECT data FROM {self.table} ORDER BY id")]
+
+    def get_all_records(self):
+        return _records(self.get_all_values())
+
+    def get(self, range_name=None, value_render_option=None, **kw):
+        s, e = _a1_rows(range_name, 2 ** 62)
+        cast = (lambda v: v) if value_render_option == "UNFORMATTED_VALUE" else str
+        with self._conn() as c:
+            return [[cast(v) for v in json.loads(d)] for (d,) in c.execute(f"SELECT data FROM {self.table} ORDER BY id LIMIT ? OFFSET ?", (e - s, s))]
+
+    def append_row(self, row, **kw):
+        self.append_rows([row])
+
+    def append_rows(self, rows, **kw):
+        with self._conn() as c:
+            c.executemany(f"INSERT INTO {self.table} (data) VALUES (?)", [(json.dumps(list(r), ensure_ascii=False),) for r in rows])
+
+    def update(self, range_name=None, values=None, **kw):
+        s, _ = _a1_rows(range_name, 2 ** 62)
+        with self._conn() as c:
+            for i, r in enumerate(values or [], s):
+                hit = c.execute(f"SELECT id FROM {self.table} ORDER BY id LIMIT 1 OFFSET ?", (i,)).fetchone()
+                if hit: c.execute(f"UPDATE {self.table} SET data=? WHERE id=?", (json.dumps(list(r), ensure_ascii=False), hit[0]))
+                else: c.execute(f"INSERT INTO {self.table} (data) VALUES (?)", (json.dumps(list(r), ensure_ascii=False),))
+
+    def delete_rows(self, start_index, end_index=None):
+        n = (end_index or start_index) - start_index + 1
+        with self._conn() as c:
+            ids = [i for (i,) in c.execute(f"SELECT id FROM {self.table} ORDER BY id LIMIT ? OFFSET ?", (n, start_index - 1))]
+            c.executemany(f"DELETE FROM {self.table} WHERE id=?", [(i,) for i in ids])
+
+class SQLiteBackend:
+    def __init__(self, path=os.environ.get("DAWEN_SQLITE_DB", "dawen_data.sqlite"), items=DEMO_ITEMS):
+        self.path, self.items = path, items
+
+    def open(self):
+        log, db = SQLiteWorksheet(self.path, "Log_Data", LOG_HEADER), SQLiteWorksheet(self.path, "DB_Items", ITEMS_HEADER)
+        if len(db.get("A1:A2")) == 1 and self.items: db.append_rows(self.items)
+        return log, db
+
+    def worksheet(self, title, header=None):
+        if header is None:
+            with sqlite3.connect(self.path, timeout=10) as c:
+                if not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (SQLiteWorksheet.table_name(title),)).fetchone(): return None
+        return SQLiteWorksheet(self.path, title, header)
+
+# --- Google Sheets ---
+class SheetsBackend:
+    def __init__(self, client_factory, title="DaWen daily record"):
+        self.client_factory, self.title = client_factory, title
+        self.book = None
+
+    def _book(self):
+        if self.book is None: self.book = self.client_factory().open(self.title)
+        return self.book
+
+    def open(self):
+        self.book = None  # 重新連線
+        spreadsheet = self._book()
+        return spreadsheet.worksheet("Log_Data"), spreadsheet.worksheet("DB_Items")
+
+    def worksheet(self, title, header=None):
+        try: return self._book().worksheet(title)
+        except WorksheetNotFound:
+            if header is None: return None
+            ws = self._book().add_worksheet(title=title, rows=1000, cols=len(header))
+            ws.append_row(header)
+            return ws
+
+def make_backend(name, client_factory=None):
+    name = (name or "sheets").lower()
+    if name == "sqlite": return SQLiteBackend()
+    if name == "fake":
+        return FakeBackend(latency=float(os.environ.get("DAWEN_FAKE_LATENCY", "0.3")),
+                           read_per_min=int(os.environ.get("DAWEN_FAKE_READ_QUOTA", "60")),
+                           write_per_min=int(os.environ.get("DAWEN_FAKE_WRITE_QUOTA", "60")))
+    if name == "sheets": return SheetsBackend(client_factory)
+    raise ValueError(f"未知的儲存後端：{name}")
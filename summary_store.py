@@ -0,0 +1,155 @@
+# 每日 / 每餐彙總表 (物化)
+# 以 (日期, 餐別) 為鍵，存分攤前的加總：熱量、蛋白質、脂肪、磷、食物投入、飲水投入、剩食。
+# 掛在 LogSync 上：新增一般品項直接累加；有完食/剩食或刪列時只重算受影響的日/餐。
+# 查詢當日、單餐、日期區間都只碰到該範圍的格子，不必重掃整份 log。
+# 尚未上傳的待寫入列 (journal.py) 另存一層 pending，查詢時疊加，畫面可立即反映。
+# 已載入的封存分片 (shards.py) 也另存一層 archive，不受 Log_Data 的 reset 影響。
+# 每次變動通知 listener 哪幾天的日合計變了 (見 rolling.py)。
+
+import bisect
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rollup import FINISH_IDS, finalize, finish_keep_mask, intake_parts
+
+PART_KEYS = ['cal', 'prot', 'fat', 'phos', 'in_food', 'in_water', 'waste']
+
+def keyed_parts(df):
+    # 原始列 -> 每個 (D, Meal_Name) 的分攤前加總
+    if df.empty: return pd.DataFrame(columns=PART_KEYS)
+    dates = df['D'] if 'D' in df.columns else pd.to_datetime(df['Date'], errors='coerce')  # D 由 schema.py 預先解析
+    d = df.assign(D=dates.dt.date, Meal_Name=df['Meal_Name'].astype(str))
+    d = d[d['D'].notna()]
+    if d.empty: return pd.DataFrame(columns=PART_KEYS)
+    d = d.iloc[finish_keep_mask(d, ['D', 'Meal_Name'])]
+    parts = intake_parts(d)[PART_KEYS]
+    parts['D'], parts['Meal_Name'] = d['D'], d['Meal_Name']
+    return parts.groupby(['D', 'Meal_Name'], sort=False).sum()
+
+class SummaryStore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cells = {}   # (date, meal) -> np.ndarray (PART_KEYS)
+        self.meals = {}   # date -> {meal}
+        self.dates = []   # 已排序日期，區間查詢用
+        self.pending, self.pending_meals = {}, {}  # 待上傳列的格子 (只有一般品項，可直接疊加)
+        self.archive, self.archive_meals, self.archive_dates = {}, {}, []  # 封存分片的格子
+        self.version = 0
+        self.listeners = []
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+            listener.days_changed(self.daily(), full=True)
+
+    def _changed(self, days=None):
+        # days=None：全部重建；否則只送這幾天 (已無資料的日子不會出現在結果中)
+        if not self.listeners: return
+        g = self.daily(days)
+        for l in self.listeners: l.days_changed(g, full=days is None, touched=days)
+
+    def set_pending(self, df):
+        g = keyed_parts(df)
+        with self.lock:
+            touched = {d for d, _ in self.pending}
+            self.pending, self.pending_meals = dict(zip(g.index, g.to_numpy(dtype=float))), {}
+            for d, m in self.pending: self.pending_meals.setdefault(d, set()).add(m)
+            self.version += 1
+            self._changed(touched | set(self.pending_meals))
+
+    def set_archive(self, df):
+        g = keyed_parts(df)
+        with self.lock:
+            self.archive, self.archive_meals = dict(zip(g.index, g.to_numpy(dtype=float))), {}
+            for d, m in self.archive: self.archive_meals.setdefault(d, set()).add(m)
+            self.archive_dates = sorted(self.archive_meals)
+            self.version += 1
+            self._changed()
+
+    # --- LogSync 通知 ---
+    def reset(self, df):
+        g = keyed_parts(df)
+        with self.lock:
+            self.cells, self.meals, self.dates = {}, {}, []
+            self._put(g, add=False)
+            self.version += 1
+            self._changed()
+
+    def append(self, df, new, day_rows=None):
+        # 只有一般品項：加總可直接累加；含完食/剩食要重算該餐 (同餐只留最後一筆)
+        if (new['Is_Finish'] if 'Is_Finish' in new.columns else new['ItemID'].isin(FINISH_IDS)).any(): return self.touch(df, new, day_rows)
+        g = keyed_parts(new)
+        with self.lock:
+            self._put(g, add=True)
+            self.version += 1
+            self._changed({d for d, _ in g.index})
+
+    def touch(self, df, rows, day_rows=None):
+        # day_rows(dates)：由 LogSync 的日期索引取出受影響日期的列；沒給才整份篩選
+        dates = set(rows['Date'].astype(str))
+        dates_p = rows['D'] if 'D' in rows.columns else pd.to_datetime(rows['Date'], errors='coerce')
+        touched = set(zip(dates_p.dt.date, rows['Meal_Name'].astype(str)))
+        g = keyed_parts(day_rows(dates) if day_rows is not None else df[df['Date'].astype(str).isin(dates)])
+        g = g[[k in touched for k in g.index]] if not g.empty else g
+        with self.lock:
+            for k in touched: self._drop(k)
+            self._put(g, add=False)
+            self.version += 1
+            self._changed({d for d, _ in touched})
+
+    def _put(self, g, add):
+        for k, vec in zip(g.index, g.to_numpy(dtype=float)):
+            if add and k in self.cells: self.cells[k] = self.cells[k] + vec
+            else: self.cells[k] = vec
+            if k[0] not in self.meals:
+                self.meals[k[0]] = set(); bisect.insort(self.dates, k[0])
+            self.meals[k[0]].add(k[1])
+
+    def _drop(self, k):
+        if self.cells.pop(k, None) is None: return
+        self.meals[k[0]].discard(k[1])
+        if not self.meals[k[0]]:
+            del self.meals[k[0]]; self.dates.pop(bisect.bisect_left(self.dates, k[0]))
+
+    # --- 查詢 ---
+    @staticmethod
+    def _finalize(vecs, index):
+        parts = pd.DataFrame(np.array(vecs, dtype=float).reshape(-1, len(PART_KEYS)), columns=PART_KEYS, index=index)
+        return finalize(parts)
+
+    def _cell(self, k):
+        vec = self.cells.get(k, np.zeros(len(PART_KEYS)))
+        if k in self.archive: vec = vec + self.archive[k]
+        return vec + self.pending[k] if k in self.pending else vec
+
+    def _day_vec(self, d):
+        meals = self.meals.get(d, set()) | self.archive_meals.get(d, set()) | self.pending_meals.get(d, set())
+        return sum((self._cell((d, m)) for m in meals), np.zeros(len(PART_KEYS)))
+
+    def day(self, d):
+        with self.lock: vec = self._day_vec(d)
+        return self._finalize([vec], [d]).iloc[0].to_dict()
+
+    def meal(self, d, meal):
+        with self.lock: vec = self._cell((d, meal))
+        return self._finalize([vec], [d]).iloc[0].to_dict()
+
+    def range(self, d0, d1):
+        # 區間內有紀錄的每一天 (index = date)
+        with self.lock:
+            days = self.dates[bisect.bisect_left(self.dates, d0):bisect.bisect_right(self.dates, d1)]
+            extra = {d for d in self.pending_meals if d0 <= d <= d1} - set(days)
+            extra |= set(self.archive_dates[bisect.bisect_left(self.archive_dates, d0):bisect.bisect_right(self.archive_dates, d1)]) - set(days)
+            if extra: days = sorted(set(days) | extra)
+            vecs = [self._day_vec(d) for d in days]
+        return self._finalize(vecs, pd.Index(days, name='Date'))
+
+    def daily(self, days=None):
+        # 指定日期 (預設全部) 中有紀錄者的日合計；指定日期時只查這幾天，成本與總天數無關
+        with self.lock:
+            if days is None: days = sorted(set(self.meals) | set(self.archive_meals) | set(self.pending_meals))
+            else: days = sorted(d for d in set(days) if d in self.meals or d in self.archive_meals or d in self.pending_meals)
+            vecs = [self._day_vec(d) for d in days]
+        return self._finalize(vecs, pd.Index(days, name='Date'))
@@ -0,0 +1,5 @@
+# 測試從 repo 根目錄匯入 app 的各模組 (app.py 旁的平行模組)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+# 測試用的 Log_Data 列與 frame
+import itertools
+
+from log_sync import rows_to_frame
+from schema import apply_log_schema
+from storage import LOG_HEADER
+
+_seq = itertools.count()
+
+def row(date, meal, item, cat, net, cal=0.0, prot=0.0, fat=0.0, phos=0.0, name=None, uid=None, time="08:00"):
+    # 欄位順序同 LOG_HEADER；全部轉字串，與工作表讀回的樣子相同
+    fin = item in ('FINISH', 'WASTE')
+    r = [uid or f"u{next(_seq):06d}", f"{date} {time}:00", date, f"{time}:00", meal, item, cat, 0, 0, net, cal, prot, fat, phos, "",
+         name or ("完食紀錄" if fin else item), time if fin else ""]
+    return [str(c) for c in r]
+
+def finish(date, meal, waste=0.0, cal=0.0, **kw):
+    # 完食 (waste=0) 或剩食紀錄
+    return row(date, meal, 'WASTE' if waste else 'FINISH', '剩食' if waste else '完食', -waste, -cal, **kw)
+
+def frame(rows):
+    return apply_log_schema(rows_to_frame(list(LOG_HEADER), [list(r) for r in rows]))
+
+def edge_rows():
+    # 規則邊界：同餐重複完食/剩食、只有剩食、只有飲水、保養品與藥品、只有藥品的一天
+    d1, d2, d3 = "2025/03/01", "2025/03/02", "2025/03/03"
+    return [
+        row(d1, "第一餐", "F001", "主食", 100, 110, 23, 1.5, 0.22),
+        row(d1, "第一餐", "W001", "水", 50),
+        row(d1, "第一餐", "S001", "保養品", 1, 10, 0, 1),
+        row(d1, "第一餐", "M001", "藥品", 1),
+        finish(d1, "第一餐"),
+        finish(d1, "第一餐", waste=30, cal=20),
+        finish(d1, "第二餐", waste=10, cal=5),
+        row(d1, "第三餐", "W002", " 飲用水 ", 40),
+        finish(d1, "第三餐", waste=10),
+        row(d2, "第一餐", "D001", "乾糧", 20, 76, 6.8, 3.2, 0.2),
+        finish(d2, "第一餐", waste=5, cal=19),
+        row(d2, "第一餐", "F002", "主食", 30, 27, 4.8, 0.75, 0.06),
+        finish(d2, "第一餐", waste=8, cal=6),
+        row(d2, "點心1", "T001", "零食", 2, 24, 2, 1, 0.04),
+        row(d3, "第一餐", "M002", "藥品", 1),
+    ]
@@ -0,0 +1,64 @@
+# FetchCoordinator：同時的讀取只抓一次；抓取途中 invalidate 會再抓；失敗要讓每個等待者都收到
+import threading
+import time
+
+import pytest
+
+from coordinator import FetchCoordinator
+
+class SlowFetch:
+    # 每次抓取都停在 gate 直到放行；回傳第幾次抓取，或丟出 fail 指定的錯誤
+    def __init__(self):
+        self.calls, self.fail = 0, None
+        self.entered, self.gate = threading.Event(), threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.entered.set(); self.gate.wait(5)
+        if self.fail is not None: raise self.fail
+        return self.calls
+
+def run(co, n):
+    # 第一個執行緒開始抓取後，再讓其餘 n-1 個加入等待
+    out = [None] * n
+    def call(i):
+        try: out[i] = co.get()
+        except Exception as e: out[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    threads[0].start(); co.fetch.entered.wait(5)
+    for t in threads[1:]: t.start()
+    time.sleep(0.1)
+    return threads, out
+
+def finish(threads, fetch):
+    fetch.gate.set()
+    for t in threads: t.join(5)
+
+def test_concurrent_reads_share_one_fetch():
+    fetch = SlowFetch()
+    co = FetchCoordinator(fetch)
+    threads, out = run(co, 5)
+    finish(threads, fetch)
+    assert out == [1] * 5 and fetch.calls == 1 and co.stats['shared'] == 4
+    assert co.get() == 1 and co.stats['hits'] == 1
+
+def test_invalidate_during_flight_fetches_again():
+    fetch = SlowFetch()
+    co = FetchCoordinator(fetch)
+    threads, out = run(co, 4)
+    co.invalidate()  # 有人在抓取途中存檔：等待者不能拿到舊結果
+    finish(threads, fetch)
+    assert out[0] == 1 and out[1:] == [2] * 3 and fetch.calls == 2
+
+def test_failure_reaches_every_waiter_and_skips_ttl():
+    fetch = SlowFetch()
+    fetch.fail = RuntimeError("quota")
+    co = FetchCoordinator(fetch)
+    threads, out = run(co, 5)
+    finish(threads, fetch)
+    assert all(isinstance(e, RuntimeError) for e in out) and fetch.calls == 1
+    fetch.fail = None
+    assert co.get() == 2  # 失敗不算 TTL 內的結果，立即重抓
+    fetch.fail = RuntimeError("again")
+    with pytest.raises(RuntimeError):
+        co.get(force=True)
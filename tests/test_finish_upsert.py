@@ -0,0 +1,87 @@
+# 完食紀錄 upsert：原地覆寫後其他裝置的增量同步要看得到 (修訂標記)；列位置被移動時重抓再試，持續衝突則報錯不寫入
+import pytest
+
+from helpers import finish, frame, row
+from local_store import LocalStore
+from log_sync import REV_HEADER, ConflictError, LogSync
+from rollup import rollup
+from storage import LOG_HEADER, FakeWorksheet
+from summary_store import SummaryStore
+
+D = "2025/03/01"
+
+@pytest.fixture
+def sheets():
+    ws = FakeWorksheet("Log_Data", [list(LOG_HEADER)] + [
+        row(D, "第一餐", "F001", "主食", 100, 110), finish(D, "第一餐"), row(D, "第二餐", "W001", "水", 30)])
+    return ws, FakeWorksheet("Log_Meta", [list(REV_HEADER)])
+
+def finish_rows(ws, meal="第一餐"):
+    return [r for r in ws.values[1:] if r[4] == meal and r[5] in ("FINISH", "WASTE")]
+
+def test_overwrite_visible_to_other_process(sheets):
+    ws, meta = sheets
+    a, b = LogSync(ws, meta=meta), LogSync(ws, meta=meta)
+    summary = SummaryStore(); b.add_listener(summary)
+    a.sync(); b.sync()
+    new = finish(D, "第一餐", waste=40, cal=44)
+    assert a.upsert_finish(new) == 'update'
+    assert finish_rows(ws) == [new] and len(ws.values) == 4  # 列數不變、最後一列也沒變
+    b.sync()
+    assert b.stats['full'] == 2 and b.rows == ws.values[1:]
+    want = rollup(frame(ws.values[1:]), 'D')
+    assert summary.day(want.index[0].date())['food'] == pytest.approx(want['food'].iloc[0])
+    a.sync()  # 自己寫的標記不會觸發整張重抓
+    assert a.stats['full'] == 1
+
+def test_revision_survives_restart(sheets, tmp_path):
+    ws, meta = sheets
+    store = LocalStore(str(tmp_path / "m.sqlite"))
+    LogSync(ws, store=store, meta=meta).sync()
+    restarted = LogSync(ws, store=store, meta=meta)
+    restarted.sync()
+    assert restarted.stats['full'] == 0  # 標記沒變：快照接續走增量
+    LogSync(ws, meta=meta).upsert_finish(finish(D, "第一餐", waste=5, cal=5))
+    restarted.sync()
+    assert restarted.stats['full'] == 1 and restarted.rows == ws.values[1:]
+
+def test_moved_row_resyncs_and_retries(sheets):
+    ws, meta = sheets
+    a = LogSync(ws, meta=meta); a.sync()
+    with ws.lock: ws.values.insert(1, row(D, "點心1", "T001", "零食", 2, 24))  # 別的裝置在上方插列，完食列往下移
+    new = finish(D, "第一餐", waste=10, cal=11)
+    assert a.upsert_finish(new) == 'update'
+    assert finish_rows(ws) == [new] and a.stats['full'] == 2
+    assert a.rows == ws.values[1:]
+
+def test_persistent_conflict_raises_without_writing(sheets):
+    ws, meta = sheets
+    a = LogSync(ws, meta=meta); a.sync()
+    before = [list(r) for r in ws.values]
+    ws.get = lambda range_name=None: [["someone-else"]]  # 每次確認都對不上
+    with pytest.raises(ConflictError):
+        a.upsert_finish(finish(D, "第一餐", waste=10, cal=11))
+    assert ws.values == before and ws.stats['update'] == 0 and meta.stats['update'] == 0
+
+def legacy_dups():
+    # 舊版留下的重複完食紀錄：位置 1、2 連續，4 單獨，最後一筆 (位置 5) 是覆寫目標
+    dups = [finish(D, "第一餐", waste=w) for w in (1, 2, 3)]
+    rows = [row(D, "第一餐", "F001", "主食", 100, 110), dups[0], dups[1], row(D, "第二餐", "W001", "水", 30), dups[2], finish(D, "第一餐")]
+    return FakeWorksheet("Log_Data", [list(LOG_HEADER)] + rows), rows
+
+def test_legacy_duplicates_deleted_per_run():
+    ws, rows = legacy_dups()
+    log = LogSync(ws); log.sync()
+    new = finish(D, "第一餐", waste=40, cal=44)
+    assert log.upsert_finish(new) == 'update'
+    assert ws.stats['delete_rows'] == 2  # 兩段，不是三次
+    assert finish_rows(ws) == [new] and [r[0] for r in ws.values[1:]] == [rows[0][0], rows[3][0], new[0]]
+    assert log.rows == ws.values[1:]
+
+def test_legacy_duplicates_verified_before_delete():
+    ws, rows = legacy_dups()
+    log = LogSync(ws); log.sync()
+    ws.values[2][0] = "moved"  # 其他裝置動過其中一段 (目標列沒變)
+    with pytest.raises(ConflictError):
+        log.upsert_finish(finish(D, "第一餐", waste=40, cal=44))
+    assert [r[0] for r in ws.values[1:]][:3] == [rows[0][0], "moved", rows[2][0]] and log.dirty
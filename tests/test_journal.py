@@ -0,0 +1,91 @@
+# 寫入日誌：一筆壞列不擋住其他列，重複失敗的列移到待處理區；整體離線時不移動任何列
+import sqlite3
+
+import pytest
+
+from helpers import row
+from journal import DEAD_AFTER, PROBE_LEVELS, WriteJournal
+
+D = "2025/03/01"
+
+class Sink:
+    # 假的上傳函式：bad 中的 UUID 一律失敗，offline 時全部失敗
+    def __init__(self):
+        self.bad, self.offline, self.written, self.calls = set(), False, [], 0
+
+    def __call__(self, rows):
+        self.calls += 1
+        if self.offline: raise ConnectionError("offline")
+        if any(r[0] in self.bad for r in rows): raise ValueError("bad row")
+        self.written += [r[0] for r in rows]
+        return [r[0] for r in rows]
+
+@pytest.fixture
+def journal(tmp_path):
+    sink, changes = Sink(), []
+    j = WriteJournal(sink, str(tmp_path / "j.sqlite"), on_change=lambda: changes.append(1), batch_size=4, retry_attempts=1, start=False)
+    return j, sink, changes
+
+def rows(n):
+    return [row(D, "第一餐", "F001", "主食", 10 + i) for i in range(n)]
+
+def pending_ids(j):
+    return [r[0] for r in j.pending_rows()]
+
+def test_bad_row_does_not_block_later_batches(journal):
+    j, sink, _ = journal
+    batch = rows(10); sink.bad.add(batch[1][0])
+    j.enqueue(batch)
+    assert j.flush_pending() == 1
+    assert sorted(sink.written) == sorted(r[0] for r in batch if r[0] != batch[1][0])
+    assert pending_ids(j) == [batch[1][0]] and j.status()['pending'] == 1
+
+def test_repeated_failures_are_dead_lettered(journal):
+    j, sink, changes = journal
+    bad = rows(1); sink.bad.add(bad[0][0])
+    j.enqueue(bad)
+    for i in range(DEAD_AFTER):
+        assert j.status()['dead'] == 0
+        j.enqueue(rows(3))  # 同一輪有其他列成功：確定是這一列的問題
+        j.flush_pending()
+    st = j.status()
+    assert st['dead'] == 1 and st['pending'] == 0 and 'bad row' in st['dead_error']
+    assert j.pending_rows() == [] and [r[0] for r, _ in j.dead_rows()] == [bad[0][0]]
+    assert changes  # 移到待處理區時通知 (畫面不再疊加這一列)
+    sink.bad.clear()
+    assert j.requeue_dead() == 1 and pending_ids(j) == [bad[0][0]]
+    assert j.flush_pending() == 0 and bad[0][0] in sink.written
+    assert (j.status()['pending'], j.status()['dead']) == (0, 0)
+
+def test_isolates_several_bad_rows(journal):
+    j, sink, _ = journal
+    j.batch_size = 16
+    batch = rows(16); sink.bad |= {batch[0][0], batch[9][0]}  # 兩半各一筆壞列
+    j.enqueue(batch)
+    assert j.flush_pending() == 2 and len(sink.written) == 14
+
+def test_lone_failing_row_is_not_dead_lettered(journal):
+    j, sink, _ = journal
+    bad = rows(1); sink.bad.add(bad[0][0])
+    j.enqueue(bad)
+    for _ in range(DEAD_AFTER + 2): j.flush_pending()
+    assert j.status()['dead'] == 0 and pending_ids(j) == [bad[0][0]]  # 沒有其他列成功，無法判斷是不是整體故障
+
+def test_outage_keeps_rows_and_bounds_calls(journal):
+    j, sink, _ = journal
+    j.enqueue(rows(20)); sink.offline = True
+    for _ in range(DEAD_AFTER + 2):
+        sink.calls = 0
+        assert j.flush_pending() == 20
+        assert sink.calls <= 1 + 2 * (PROBE_LEVELS + 1)  # 整批一次 + 每層兩半各一次
+    assert j.status()['dead'] == 0 and len(pending_ids(j)) == 20 and 'offline' in j.status()['last_error']
+    sink.offline = False
+    assert j.flush_pending() == 0 and len(sink.written) == 20 and j.status()['last_error'] is None
+
+def test_old_journal_schema_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(path) as c:
+        c.execute("CREATE TABLE journal (uuid TEXT PRIMARY KEY, data TEXT, created REAL, flushed REAL, attempts INTEGER DEFAULT 0, last_error TEXT)")
+        c.execute("INSERT INTO journal (uuid, data, created) VALUES ('u1', ?, 0)", ('["u1"]',))
+    j = WriteJournal(Sink(), path, start=False)
+    assert j.status()['pending'] == 1 and j.status()['dead'] == 0
@@ -0,0 +1,67 @@
+# SheetMirror：共用快照依資料版本重建 (含待上傳列)；已封存期間不能改完食紀錄
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from helpers import finish, row
+from local_store import SheetMirror
+from storage import LOG_HEADER, FakeBackend
+
+D = "2025/03/01"
+
+@pytest.fixture
+def backend():
+    return FakeBackend(log_rows=[row(D, "第一餐", "F001", "主食", 50, 55)], read_per_min=0, write_per_min=0)
+
+@pytest.fixture
+def mirror(backend, tmp_path):
+    m = SheetMirror(backend.open, str(tmp_path / "m.sqlite"), open_shard=backend.worksheet)
+    m.ready.wait(10)
+    return m
+
+def test_index_rebuilds_on_every_pending_change(mirror):
+    seen = [mirror.index()]
+    for _ in range(3):
+        mirror._pending_changed()  # 內容相同、frame 是新的：版本一定前進，不靠物件 id
+        assert mirror.index() is not seen[-1]
+        seen.append(mirror.index())
+    assert mirror.index() is seen[-1]  # 沒有變動就沿用
+
+def test_index_includes_pending_rows(mirror):
+    mirror.journal.wake.clear()
+    r = row(D, "第二餐", "W001", "水", 30)
+    mirror.journal.enqueue([r])
+    uuids = set(mirror.index().df['UUID'].astype(str))
+    assert r[0] in uuids  # 還在日誌或已上傳都看得到
+
+def test_finish_rejected_for_archived_period(mirror, backend):
+    n = len(backend.sheet_log.values)
+    with pytest.raises(ValueError):
+        mirror.upsert_finish(finish("2020/01/05", "第一餐"))
+    assert len(backend.sheet_log.values) == n
+    today = date.today().strftime("%Y/%m/%d")
+    assert not mirror.finish_locked(date.today())
+    mirror.upsert_finish(finish(today, "第一餐"))
+    assert len(backend.sheet_log.values) == n + 1
+
+def test_index_does_not_wait_for_slow_connect(backend, tmp_path):
+    path = str(tmp_path / "cold.sqlite")
+    SheetMirror(backend.open, path).ready.wait(10)  # 先留下本機快照
+    go = threading.Event()
+    def slow_connect():
+        go.wait(10); return backend.open()
+    m = SheetMirror(slow_connect, path)
+    t = time.monotonic()
+    assert m.sync() and D in set(m.index().df['Date'].astype(str))  # 冷啟動直接用快照，不等背景對帳
+    assert time.monotonic() - t < 1 and not m.ready.is_set()
+    go.set(); m.ready.wait(10)
+
+def test_refresh_picks_up_cell_edited_in_sheet(mirror, backend):
+    mirror.sync(force=True)
+    before = mirror.summary.day(date(2025, 3, 1))['cal']
+    backend.sheet_log.values[1][LOG_HEADER.index("Cal_Sub")] = "99"  # 在 Google Sheets 上手動改格子
+    mirror.log.invalidate(); mirror.fetcher.invalidate(wrote=False)  # 「重新整理」按鈕
+    mirror.sync()
+    assert before == 55 and mirror.summary.day(date(2025, 3, 1))['cal'] == 99
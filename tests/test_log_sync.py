@@ -0,0 +1,75 @@
+# LogSync 增量同步：水位線之後只抓新列；表單被改動 (刪列、插列) 時整張重抓；本機快照接續水位線
+import time
+
+import pytest
+
+from helpers import finish, frame, row
+from local_store import LocalStore
+from log_sync import FULL_AT, LogSync
+from rollup import rollup
+from storage import LOG_HEADER, FakeWorksheet
+from summary_store import SummaryStore
+
+D = "2025/03/01"
+
+def sheet(rows):
+    return FakeWorksheet("Log_Data", [list(LOG_HEADER)] + [list(r) for r in rows])
+
+def uuids(log):
+    return [r[0] for r in log.rows]
+
+@pytest.fixture
+def ws():
+    return sheet([row(D, "第一餐", "F001", "主食", 50, 55), row(D, "第一餐", "W001", "水", 20)])
+
+def test_incremental_fetches_only_new_rows(ws):
+    log = LogSync(ws); log.sync()
+    assert log.stats == {'full': 1, 'incr': 0, 'rows_fetched': 2}
+    new = [row(D, "第二餐", "F002", "主食", 30, 27), finish(D, "第二餐", waste=5, cal=4)]
+    ws.append_rows(new)
+    log.sync()
+    assert log.stats['full'] == 1 and log.stats['incr'] == 1 and log.stats['rows_fetched'] == 4
+    assert uuids(log) == [r[0] for r in ws.values[1:]] and len(log.df) == 4
+    log.sync()  # 沒有新列：只讀水位線那一列
+    assert log.stats['full'] == 1 and log.stats['rows_fetched'] == 4
+
+def test_deleted_rows_trigger_full_resync(ws):
+    log = LogSync(ws); log.sync()
+    ws.delete_rows(3)  # 刪掉最後一列：水位線位置已不是上次最後一筆
+    log.sync()
+    assert log.stats['full'] == 2 and uuids(log) == [ws.values[1][0]]
+
+def test_inserted_rows_trigger_full_resync(ws):
+    log = LogSync(ws); log.sync()
+    with ws.lock: ws.values.insert(1, row(D, "點心1", "T001", "零食", 2, 24))
+    log.sync()
+    assert log.stats['full'] == 2 and uuids(log) == [r[0] for r in ws.values[1:]]
+
+def test_resume_from_local_snapshot(tmp_path, ws):
+    store = LocalStore(str(tmp_path / "m.sqlite"))
+    LogSync(ws, store=store).sync()
+    ws.append_row(row(D, "第二餐", "F001", "主食", 40, 44))
+    log = LogSync(ws, store=store)  # 重新啟動：由快照接續，下一次同步走增量
+    assert len(log.rows) == 2
+    log.sync()
+    assert log.stats == {'full': 0, 'incr': 1, 'rows_fetched': 1}
+    assert store.load("Log_Data")[1] == [list(r) for r in ws.values[1:]]
+
+def test_resume_keeps_full_resync_clock(tmp_path, ws):
+    store = LocalStore(str(tmp_path / "m.sqlite"))
+    LogSync(ws, store=store, full_resync_sec=60).sync()
+    store.save("Log_Data" + FULL_AT, ["Full_At"], [[time.time() - 120]])  # 上次整張重抓是兩分鐘前
+    log = LogSync(ws, store=store, full_resync_sec=60)
+    log.sync()
+    assert log.stats['full'] == 1  # 重啟不會把計時歸零
+
+def test_summary_listener_tracks_incremental_changes(ws):
+    log, summary = LogSync(ws), SummaryStore()
+    log.add_listener(summary); log.sync()
+    ws.append_rows([finish(D, "第一餐", cal=0), row("2025/03/02", "第一餐", "D001", "乾糧", 20, 76)])
+    log.sync()
+    ws.append_row(finish(D, "第一餐", waste=10, cal=11))  # 同餐第二筆完食列：只留最後一筆
+    log.sync()
+    want = rollup(frame(ws.values[1:]), 'D')
+    got = summary.range(want.index[0].date(), want.index[-1].date())
+    assert got.to_numpy() == pytest.approx(want.to_numpy(), abs=1e-4)
@@ -0,0 +1,54 @@
+# 向量化 rollup 與舊版逐組邏輯 (clean_duplicate_finish_records + calculate_intake_breakdown) 逐日、逐餐比對
+import numpy as np
+import pytest
+
+from bench.synth import synth_log
+from helpers import edge_rows, frame
+from rollup import STAT_KEYS, calculate_intake_breakdown, clean_duplicate_finish_records, rollup, summarize
+
+def legacy(g):
+    # 舊版 app.py 的算法：先清重複完食列，再拆食物/飲水，營養素直接加總
+    c = clean_duplicate_finish_records(g.reset_index(drop=True))
+    food, water = calculate_intake_breakdown(c.copy())
+    num = lambda col: float(c[col].astype(float).sum())
+    return {'cal': num('Cal_Sub'), 'food': food, 'water': water, 'prot': num('Prot_Sub'), 'fat': num('Fat_Sub'), 'phos': num('Phos_Sub')}
+
+def assert_same(got, want, where):
+    for k in STAT_KEYS:
+        assert np.isclose(got[k], want[k], rtol=1e-5, atol=1e-3), f"{where} {k}: {got[k]} != {want[k]}"
+
+@pytest.fixture(scope="module", params=["edge", "synth"])
+def log_df(request):
+    return frame(edge_rows() if request.param == "edge" else synth_log(years=0.25, seed=7))
+
+def test_daily_matches_legacy(log_df):
+    got = rollup(log_df, 'Date')
+    groups = dict(tuple(log_df.groupby('Date', observed=True)))
+    assert list(got.index) == sorted(groups)
+    for d, g in groups.items(): assert_same(got.loc[d], legacy(g), d)
+
+def test_meal_matches_legacy(log_df):
+    got = rollup(log_df, ['Date', 'Meal_Name'])
+    groups = dict(tuple(log_df.groupby(['Date', 'Meal_Name'], observed=True)))
+    assert len(got) == len(groups)
+    for k, g in groups.items(): assert_same(got.loc[k], legacy(g), k)
+
+def test_summarize_matches_legacy(log_df):
+    day = log_df[log_df['Date'] == log_df['Date'].iloc[0]]
+    assert_same(summarize(day), legacy(day), "summarize")
+
+def test_edge_rules():
+    df = frame(edge_rows())
+    m = rollup(df, ['Date', 'Meal_Name'])
+    # 重複完食列只留最後一筆剩食 30g，依 100:50 分攤；保養品的熱量照算但不計重量
+    assert_same(m.loc[("2025/03/01", "第一餐")], {'cal': 100.0, 'food': 80.0, 'water': 40.0, 'prot': 23.0, 'fat': 2.5, 'phos': 0.22}, "dup finish")
+    # 只有剩食：全部算在食物
+    assert_same(m.loc[("2025/03/01", "第二餐")], {'cal': -5.0, 'food': -10.0, 'water': 0.0, 'prot': 0.0, 'fat': 0.0, 'phos': 0.0}, "waste only")
+    # 只有飲水：剩食全部算在飲水 (Category 前後空白不影響)
+    assert_same(m.loc[("2025/03/01", "第三餐")], {'cal': 0.0, 'food': 0.0, 'water': 30.0, 'prot': 0.0, 'fat': 0.0, 'phos': 0.0}, "water only")
+    # 只有藥品的一天：全為 0
+    assert_same(rollup(df, 'Date').loc["2025/03/03"], dict.fromkeys(STAT_KEYS, 0.0), "meds only")
+
+def test_empty():
+    assert rollup(frame([]), 'Date').empty
+    assert summarize(frame([])) == dict.fromkeys(STAT_KEYS, 0.0)
@@ -0,0 +1,18 @@
+# Log_Data 型別：會被讀回來寫入新列的數值欄不能有精度損失
+import pytest
+
+from helpers import frame, row
+from schema import LOG_FLOAT32, LOG_NUMERIC, concat_log
+
+def test_written_back_columns_round_trip_exactly():
+    r = row("2025/03/01", "第一餐", "F001", "主食", 50.1, 55.11)
+    r[7], r[8] = "80.1", "30.2"  # Scale_Reading, Bowl_Weight
+    df = concat_log([frame([r]), frame([row("2025/03/02", "第一餐", "W001", "水", 20)])])
+    for c, want in (('Scale_Reading', 80.1), ('Bowl_Weight', 30.2), ('Net_Quantity', 50.1), ('Cal_Sub', 55.11)):
+        assert df[c].dtype == 'float64' and float(df[c].iloc[0]) == want, c
+    # 前筆參考 -> 下一筆淨重：與直接用 Python float 計算相同
+    assert 100.0 - float(df['Scale_Reading'].iloc[0]) == 100.0 - 80.1
+
+@pytest.mark.parametrize("col", LOG_NUMERIC)
+def test_numeric_dtypes(col):
+    assert frame([row("2025/03/01", "第一餐", "F001", "主食", 1)])[col].dtype == ('float32' if col in LOG_FLOAT32 else 'float64')
@@ -0,0 +1,81 @@
+# ShardSet.archive：已結束期間搬到分片；寫分片時不持有 log.lock，刪列以最新位置進行
+import threading
+from datetime import date
+
+import pytest
+
+from helpers import row
+from local_store import LocalStore
+from log_sync import ConflictError, LogSync
+from shards import SHARD_PREFIX, ShardSet
+from storage import LOG_HEADER, FakeWorksheet
+
+TODAY = date(2025, 3, 10)
+OLD, NEW = "2024/05/01", "2025/03/01"
+
+class Sheets:
+    def __init__(self, log_rows):
+        self.log = FakeWorksheet("Log_Data", [list(LOG_HEADER)] + [list(r) for r in log_rows])
+        self.sheets = {}
+
+    def open_shard(self, title, header=None):
+        if title not in self.sheets and header is not None: self.sheets[title] = FakeWorksheet(title, [header])
+        return self.sheets.get(title)
+
+@pytest.fixture
+def env(tmp_path):
+    rows = [row(OLD, "第一餐", "F001", "主食", 50, 55), row(NEW, "第一餐", "F001", "主食", 40, 44), row(OLD, "第二餐", "W001", "水", 20)]
+    sh = Sheets(rows)
+    store = LocalStore(str(tmp_path / "s.sqlite"))
+    log = LogSync(sh.log, store=store)
+    log.sync()
+    return sh, log, ShardSet(sh.open_shard, store, freq="Y"), rows
+
+def test_archive_moves_closed_period(env):
+    sh, log, shards, rows = env
+    assert shards.archive(log, TODAY) == 2
+    assert [r[0] for r in sh.log.values[1:]] == [rows[1][0]]
+    assert [r[0] for r in sh.sheets[SHARD_PREFIX + "2024"].values[1:]] == [rows[0][0], rows[2][0]]
+    assert shards.manifest["2024"]["Rows"] == "2" and [r[0] for r in log.rows] == [rows[1][0]]
+    assert shards.archive(log, TODAY) == 0  # 重跑不重複
+
+def test_shard_writes_do_not_hold_log_lock(env):
+    sh, log, shards, rows = env
+    shard = sh.open_shard(SHARD_PREFIX + "2024", list(LOG_HEADER))
+    seen, append = [], shard.append_rows
+    def probe(new, **kw):
+        # 其他 session 此時要能拿到 log.lock，並在 Log_Data 前面插入新列 (讓快取位置失效)
+        t = threading.Thread(target=lambda: seen.append(log.lock.acquire(timeout=1) and (log.lock.release() or True)))
+        t.start(); t.join()
+        sh.log.values.insert(1, row(NEW, "第二餐", "F002", "主食", 30, 27))
+        append(new, **kw)
+    shard.append_rows = probe
+    assert shards.archive(log, TODAY) == 2
+    assert seen == [True]
+    left = [r[0] for r in sh.log.values[1:]]
+    assert len(left) == 2 and rows[1][0] in left and rows[0][0] not in left and rows[2][0] not in left
+
+def test_delete_aborts_when_rows_moved_after_sync(env):
+    sh, log, shards, rows = env
+    get = sh.log.get
+    def moved(range_name=None, **kw):
+        # 刪列前的核對讀取時，其他裝置剛在前面插入一列
+        if range_name and not any(r[0] == "X" for r in sh.log.values): sh.log.values.insert(1, ["X"] + [""] * (len(LOG_HEADER) - 1))
+        return get(range_name, **kw)
+    sh.log.get = moved
+    with pytest.raises(ConflictError):
+        shards.archive(log, TODAY)
+    assert len(sh.log.values) == 5 and log.dirty  # 沒有誤刪，下次整張重抓
+    sh.log.get = get
+    assert shards.archive(log, TODAY) == 2
+    assert [r[0] for r in sh.log.values[1:]] == ["X", rows[1][0]]
+    assert len(sh.sheets[SHARD_PREFIX + "2024"].values) == 3
+
+def test_archive_keeps_numbers_numeric(env):
+    sh, log, shards, rows = env
+    i_net, i_cal = LOG_HEADER.index("Net_Quantity"), LOG_HEADER.index("Cal_Sub")
+    sh.log.values[1][i_net], sh.log.values[1][i_cal] = 19.9, 21.89  # 正式表單裡數字欄位是數值，不是文字
+    shards.archive(log, TODAY)
+    moved = sh.sheets[SHARD_PREFIX + "2024"].values[1]
+    assert moved[i_net] == 19.9 and moved[i_cal] == 21.89 and moved[2] == OLD
+    assert shards.loaded["2024"]["Net_Quantity"].iloc[0] == 19.9
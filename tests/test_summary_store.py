@@ -0,0 +1,82 @@
+# SummaryStore 增量更新：新增、完食 upsert、刪列、待上傳層之後，結果與整份 rollup 相同；更正只讀受影響的日期
+from datetime import date
+
+import pytest
+
+from helpers import finish, frame, row
+from log_sync import LogSync
+from rollup import STAT_KEYS, rollup
+from storage import LOG_HEADER, FakeWorksheet
+from summary_store import SummaryStore
+
+D1, D2 = "2025/03/01", "2025/03/02"
+
+@pytest.fixture
+def synced():
+    ws = FakeWorksheet("Log_Data", [list(LOG_HEADER)] + [
+        row(D1, "第一餐", "F001", "主食", 100, 110, 23, 1.5, 0.22), row(D1, "第一餐", "W001", "水", 50),
+        row(D1, "第二餐", "D001", "乾糧", 20, 76, 6.8, 3.2, 0.2), row(D2, "第一餐", "F002", "主食", 30, 27, 4.8, 0.75, 0.06)])
+    log, summary = LogSync(ws), SummaryStore()
+    log.add_listener(summary); log.sync()
+    return ws, log, summary
+
+def assert_matches_log(ws, summary):
+    want = rollup(frame(ws.values[1:]), ['D', 'Meal_Name'])
+    for (d, m), vec in want.iterrows():
+        assert [summary.meal(d.date(), m)[k] for k in STAT_KEYS] == pytest.approx(list(vec), abs=1e-4), (d, m)
+    daily = rollup(frame(ws.values[1:]), 'D')
+    got = summary.range(date(2025, 1, 1), date(2025, 12, 31))
+    assert list(got.index) == [d.date() for d in daily.index]
+    assert got.to_numpy() == pytest.approx(daily.to_numpy(), abs=1e-4)
+
+def test_incremental_events_match_full_rollup(synced):
+    ws, log, summary = synced
+    add = [row(D1, "第一餐", "T001", "零食", 2, 24), row(D2, "第二餐", "W002", "飲用水", 40)]
+    ws.append_rows(add); log.apply_local(add)
+    assert_matches_log(ws, summary)
+    assert log.upsert_finish(finish(D1, "第一餐", waste=30, cal=20)) == 'append'
+    assert_matches_log(ws, summary)
+    assert log.upsert_finish(finish(D1, "第一餐", waste=12, cal=8)) == 'update'  # 同餐再存：原地覆寫
+    assert_matches_log(ws, summary)
+    dead = ws.values[3][0]
+    ws.delete_rows(4); log.apply_local([], [dead])
+    assert_matches_log(ws, summary)
+
+def test_corrections_read_only_affected_days(synced):
+    ws, log, summary = synced
+    seen, day_rows = [], log.day_rows
+    log.day_rows = lambda dates: seen.append(set(dates)) or day_rows(dates)
+    log.upsert_finish(finish(D2, "第一餐", waste=5, cal=4))
+    log.upsert_finish(finish(D2, "第一餐", waste=6, cal=5))
+    assert seen == [{D2}, {D2}]
+    assert_matches_log(ws, summary)
+
+def test_pending_layer_overlays_and_clears(synced):
+    ws, log, summary = synced
+    before = summary.day(date(2025, 3, 2))
+    pend = frame([row(D2, "第一餐", "F001", "主食", 10, 11), row("2025/03/05", "點心1", "T001", "零食", 1, 12)])
+    summary.set_pending(pend)
+    assert summary.day(date(2025, 3, 2))['cal'] == pytest.approx(before['cal'] + 11)
+    assert list(summary.range(date(2025, 3, 1), date(2025, 3, 31)).index) == [date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 5)]
+    summary.set_pending(frame([]))
+    assert summary.day(date(2025, 3, 2)) == pytest.approx(before)
+    assert_matches_log(ws, summary)
+
+class NoScan(dict):
+    # 整份掃描就失敗：增量通知只能查受影響的日期
+    def __iter__(self): raise AssertionError("掃描了全部日期")
+
+class Recorder:
+    def __init__(self): self.events = []
+    def days_changed(self, g, full=False, touched=None): self.events.append((g, full, touched))
+
+def test_change_events_look_up_only_touched_days(synced):
+    ws, log, summary = synced
+    rec = Recorder(); summary.add_listener(rec)
+    summary.meals, summary.archive_meals = NoScan(summary.meals), NoScan(summary.archive_meals)
+    log.upsert_finish(finish(D2, "第一餐", waste=5, cal=4))
+    summary.set_pending(frame([row(D1, "第二餐", "T001", "零食", 1, 12)]))
+    (g1, full1, t1), (g2, full2, t2) = rec.events[1:]
+    assert not full1 and t1 == {date(2025, 3, 2)} and list(g1.index) == [date(2025, 3, 2)]
+    assert not full2 and t2 == {date(2025, 3, 1)} and list(g2.index) == [date(2025, 3, 1)]
+    assert g2.loc[date(2025, 3, 1)].to_dict() == pytest.approx(summary.day(date(2025, 3, 1)))
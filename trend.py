@@ -0,0 +1,52 @@
+# 飲食趨勢圖
+# 依區間長度自動選解析度：三個月內逐日長條 (與原本相同)；更長的區間改用週或月分桶，
+# 畫平均線與最小/最大值色帶，送到瀏覽器的點數有上限。圖在 app.py 以 (區間, 彙總表版本) 快取。
+
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+DAILY_MAX_DAYS = 92    # 超過改週平均
+WEEKLY_MAX_DAYS = 731  # 超過改月平均
+SERIES = [('cal', '熱量', '#FFD700', False), ('food', '食量', '#90EE90', False), ('water', '飲水', '#00BFFF', True)]
+RES_LABEL = {'D': '每日', 'W': '週平均', 'M': '月平均'}
+
+def pick_resolution(d0, d1):
+    days = (d1 - d0).days + 1
+    return 'D' if days <= DAILY_MAX_DAYS else 'W' if days <= WEEKLY_MAX_DAYS else 'M'
+
+def bucket(df_daily, freq):
+    # df_daily：index 為日期的每日彙總 (summary_store.range)；回傳每桶 mean/min/max，index = 桶起始日
+    s = df_daily[[k for k, *_ in SERIES]]
+    periods = pd.DatetimeIndex(s.index).to_period(freq)
+    g = s.groupby(periods).agg(['mean', 'min', 'max'])
+    g.index = g.index.start_time
+    return g
+
+def _rgba(hex_color, alpha):
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r},{g},{b},{alpha})"
+
+def build_trend(df_daily, d0, d1):
+    # 回傳 (figure, 解析度代碼, 點數)；沒有資料時 figure 為 None
+    if df_daily.empty: return None, 'D', 0
+    res = pick_resolution(d0, d1)
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    if res == 'D':
+        x = df_daily.index
+        fig.add_trace(go.Bar(x=x, y=df_daily['cal'], name="熱量", marker_color='#FFD700', opacity=0.6), secondary_y=False)
+        fig.add_trace(go.Bar(x=x, y=df_daily['food'], name="食量", marker_color='#90EE90', opacity=0.6), secondary_y=False)
+        fig.add_trace(go.Scatter(x=x, y=df_daily['water'], name="飲水", line=dict(color='#00BFFF', width=2)), secondary_y=True)
+        n = len(df_daily)
+    else:
+        g = bucket(df_daily, res)
+        x = g.index
+        for key, label, color, y2 in SERIES:
+            # 先畫最小值 (透明)，最大值填到上一條線形成色帶，最後畫平均線
+            fig.add_trace(go.Scatter(x=x, y=g[(key, 'min')], line=dict(width=0), hoverinfo='skip', showlegend=False, legendgroup=key), secondary_y=y2)
+            fig.add_trace(go.Scatter(x=x, y=g[(key, 'max')], line=dict(width=0), fill='tonexty', fillcolor=_rgba(color, 0.2), hoverinfo='skip', showlegend=False, legendgroup=key), secondary_y=y2)
+            fig.add_trace(go.Scatter(x=x, y=g[(key, 'mean')], name=f"{label} ({RES_LABEL[res]})", legendgroup=key, line=dict(color=color, width=2),
+                                     customdata=g[[(key, 'min'), (key, 'max')]].to_numpy(), hovertemplate="%{y:.1f} (%{customdata[0]:.1f}–%{customdata[1]:.1f})"), secondary_y=y2)
+        n = len(g)
+    fig.update_layout(height=380, legend=dict(orientation="h", y=-0.25, x=0.5, xanchor="center"), barmode='group', margin=dict(t=10,b=20))
+    return fig, res, n